@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import warnings
 from ui_components import setup_sidebar, main_page, average_profit_calculator
 
@@ -26,8 +25,22 @@ elif page == "아키텍처":
     
     * **`app.py`**: Streamlit 앱의 진입점으로, UI 컴포넌트들을 불러와 페이지를 구성합니다.
     * **`ui_components.py`**: 페이지의 레이아웃, 버튼, 슬라이더 등 **사용자 인터페이스** 로직을 관리합니다.
-    * **`data_loader.py`**: **데이터 다운로드**를 담당하며, `st.cache_data`를 이용해 캐싱 효율을 높입니다.
+    * **`charts.py`**: 가격/RSI 차트를 그립니다. 긴 기간은 **LTTB 다운샘플링**으로 줄이고, 선택한 구간만 원본 해상도로 다시 그리며, 렌더링 결과를 캐시합니다.
+    * **`data_loader.py`**: **데이터 다운로드**를 담당하며, 종목별 영구 저장소(`data_store.py`)를 통해 필요한 구간만 내려받습니다.
+    * **`data_store.py`**: 종목별 **메모리 맵 OHLCV 저장소**와 교체 가능한 데이터 제공자(yfinance / 로컬 CSV / 합성·지연 모의)를 제공하며, 여러 종목을 **동시에 일괄 로딩**(재시도·백오프, 종목별 요청 간격 제한)합니다.
     * **`backtest_core.py`**: 모든 **백테스트 로직** (RSI, 커널 회귀, 매매 시그널, 수익률 계산)을 처리합니다.
+    * **`divergence.py`**: 극값(argrelextrema 와 같은 규칙)과 RSI 다이버전스를 **정수 위치 배열 연산**으로 찾고, 종목 유니버스 전체를 한 번에 스캔합니다.
+    * **`indicator_cache.py`**: RSI·커널 회귀·극값 등 지표를 **가격 지문 + 파라미터** 기준으로 LRU 캐싱해 최적화 시도 간에 재사용합니다.
+    * **`optimizer.py`**: Optuna 탐색 공간, **워크포워드 목적 함수**(폴드별 가지치기, 표본 외 수익률), **다중 충실도 최적화**(주봉·최근 구간 탐색 후 상위 설정만 일봉 재평가, 순위 상관 보고), **프로세스 풀 병렬 최적화**(메모리 맵 공유 종가 배열)를 담당합니다.
+    * **`study_store.py`**: Optuna 스터디를 종목·기간·탐색 공간별로 **SQLite 에 저장**해 이어서 최적화하고, 관련 스터디의 상위 파라미터로 워밍 스타트합니다.
+    * **`portfolio.py`**: 종목 유니버스를 **동시 로딩 + 프로세스 풀 백테스트**로 평가하고 결과를 끝나는 순서대로 스트리밍합니다.
+    * **`batch_runner.py`**: Streamlit 없이 실행하는 **배치 CLI**로, 유니버스 × 파라미터 그리드 백테스트와 종목별 최적화 결과를 JSON Lines 로 기록하고 중단된 지점부터 이어서 실행합니다.
+    * **`panel.py`**: 일자 × 종목 가격 행렬로 전 종목 지표·신호를 **블록 단위 벡터 연산**으로 계산하고, 하나의 자본 계좌를 종목별 비중으로 나눠 쓰는 **포트폴리오 시뮬레이션**을 수행합니다.
+    * **`panel_matrix.py`**: 패널 백테스트와 유니버스 스캔이 함께 쓰는 (종목 × 일자) 행렬 변환, 유효 구간, 결측 채우기, 블록 RSI 헬퍼입니다.
+    * **`robustness.py`**: 종가에서 **블록 부트스트랩 / 가격 노이즈** 경로를 만들어 (경로 × 일자) 행렬로 일괄 평가하고, 큰 작업은 프로세스 풀로 나눠 수익률·낙폭 분포를 계산합니다.
+    * **`streaming.py`**: 새 봉을 추가할 때마다 전체 재계산 없이 지표·다이버전스·포지션을 갱신하는 **스트리밍 백테스트**입니다.
+    * **`profiling.py`**: 백테스트 단계별 타이머·카운터와 훅(callback) API, 최적화 시도별 소요 시간 요약을 제공합니다.
+    * **`kernel_regression.py`**: 고정 대역폭 국소 선형 커널 회귀를 **한 번의 벡터 연산**으로 계산합니다. (statsmodels 기준 모드 포함)
     
     이 구조는 코드의 **가독성과 유지보수성**을 향상시키며, 기능별로 독립적인 개발이 가능하게 합니다.
     """)
\ No newline at end of file
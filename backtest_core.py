@@ -1,106 +1,121 @@
 import pandas as pd
 import numpy as np
-from statsmodels.nonparametric.kernel_regression import KernelReg
-from scipy.signal import argrelextrema
-import streamlit as st
+from kernel_regression import kernel_regression
+from divergence import local_extrema, divergence_candidates, find_divergence_positions, apply_divergences, \
+    to_date_tuples
+from indicator_cache import series_fingerprint
+from profiling import stage
 
-def run_backtest(df_input, params, initial_balance, fee=0.001):
-    df_temp = df_input.copy()
+# 기본 전략 파라미터 (평균 수익률 계산기·벤치마크·배치 실행기의 기본값)
+DEFAULT_PARAMS = {
+    'kr_window': 50, 'kr_bandwidth': 5.0, 'bb_k': 0.7,
+    'rsi_period': 14, 'extrema_order': 5,
+    'rsi_oversold': 30, 'rsi_overbought': 70,
+}
 
-    # RSI 계산 함수
-    def compute_rsi(series, period):
-        delta = series.diff()
-        gain = np.where(delta > 0, delta, 0)
-        loss = np.where(delta < 0, -delta, 0)
-        avg_gain = pd.Series(gain, index=series.index).rolling(period).mean()
-        avg_loss = pd.Series(loss, index=series.index).rolling(period).mean()
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+# RSI 계산 함수
+def compute_rsi(series, period):
+    delta = series.diff()
+    gain = np.where(delta > 0, delta, 0)
+    loss = np.where(delta < 0, -delta, 0)
+    avg_gain = pd.Series(gain, index=series.index).rolling(period).mean()
+    avg_loss = pd.Series(loss, index=series.index).rolling(period).mean()
+    rs = avg_gain / avg_loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
 
-    df_temp["RSI"] = compute_rsi(df_temp["Close"].squeeze(), params['rsi_period'])
 
-    # 커널 회귀 예측 및 볼린저 밴드
-    x = np.arange(len(df_temp))
+# 지표 단계별 계산 (cache 가 주어지면 가격 지문 + 해당 단계 파라미터로 재사용)
+def _indicator(cache, fingerprint, key, compute):
+    if cache is None:
+        return compute()
+    return cache.get_or_compute((fingerprint,) + key, compute)
+
+
+def _rsi(cache, fingerprint, y, period):
+    return _indicator(cache, fingerprint, ('rsi', period),
+                      lambda: compute_rsi(pd.Series(y), period).to_numpy())
+
+
+def _y_pred(cache, fingerprint, y, window, bandwidth, kr_method="numpy", profiler=None):
+    return _indicator(cache, fingerprint, ('y_pred', window, float(bandwidth), kr_method),
+                      lambda: kernel_regression(y, window, bandwidth, method=kr_method, profiler=profiler))
+
+
+def _volatility(cache, fingerprint, y):
+    return _indicator(cache, fingerprint, ('vol', 20), lambda: pd.Series(y).rolling(20).std().to_numpy())
+
+
+# (극대 위치, 극소 위치) — scipy argrelextrema(mode='clip') 와 같은 규칙
+def _extrema(cache, fingerprint, y, order):
+    return _indicator(cache, fingerprint, ('extrema', order), lambda: local_extrema(y, order))
+
+
+# 연속된 극값 쌍에서 가격과 RSI 가 엇갈리는 강세/약세 다이버전스 탐지 → [(p1 날짜, p2 날짜, 종류)] (차트 표시용)
+def find_divergences(df_temp, local_min_price, local_max_price, params):
+    p1, p2, kind = find_divergence_positions(df_temp["Close"].to_numpy(dtype=np.float64).ravel(),
+                                             df_temp["RSI"].to_numpy(dtype=np.float64), local_min_price,
+                                             local_max_price, params['rsi_oversold'], params['rsi_overbought'])
+    return to_date_tuples(df_temp.index, p1, p2, kind)
+
+
+def run_backtest(df_input, params, initial_balance, fee=0.001, kr_method="numpy", cache=None, profiler=None):
+    df_temp = df_input.copy()
     y = df_temp['Close'].to_numpy().ravel()
-    y_pred = np.full(len(y), np.nan)
+    fingerprint = series_fingerprint(y) if cache is not None else None
+
+    with stage(profiler, 'rsi'):
+        df_temp["RSI"] = _rsi(cache, fingerprint, y, int(params['rsi_period']))
+
+    # 커널 회귀 예측 및 볼린저 밴드
     window = int(params['kr_window'])
 
     if window >= len(y):
         return -100, 0, pd.DataFrame(), pd.DataFrame(), []
 
-    for i in range(window, len(y)):
-        x_train = x[i - window:i]
-        y_train = y[i - window:i]
-        try:
-            kr = KernelReg(endog=y_train, exog=x_train, var_type='c', bw=[params['kr_bandwidth']])
-            y_pred[i] = kr.fit([x[i]])[0][0]
-        except Exception:
-            y_pred[i] = np.nan
+    with stage(profiler, 'kernel_regression'):
+        y_pred = _y_pred(cache, fingerprint, y, window, params['kr_bandwidth'], kr_method, profiler)
 
     df_temp['y_pred'] = y_pred
-    vol = pd.Series(y).rolling(20).std()
-    df_temp['band'] = (params['bb_k'] * vol).values
+    with stage(profiler, 'band'):
+        vol = _volatility(cache, fingerprint, y)
+        df_temp['band'] = params['bb_k'] * vol
 
     # RSI 다이버전스 감지
     order = int(params['extrema_order'])
-    local_max_price = argrelextrema(df_temp["Close"].values, np.greater_equal, order=order)[0]
-    local_min_price = argrelextrema(df_temp["Close"].values, np.less_equal, order=order)[0]
-    divergences = []
-
-    for i in range(1, len(local_min_price)):
-        p1_idx, p2_idx = int(local_min_price[i - 1]), int(local_min_price[i])
-        if df_temp["Close"].iloc[p2_idx].item() < df_temp["Close"].iloc[p1_idx].item() and \
-           df_temp["RSI"].iloc[p2_idx].item() > df_temp["RSI"].iloc[p1_idx].item():
-            if df_temp["RSI"].iloc[p2_idx].item() <= params['rsi_oversold']:
-                divergences.append((df_temp.index[p1_idx], df_temp.index[p2_idx], "bullish"))
-
-    for i in range(1, len(local_max_price)):
-        p1_idx, p2_idx = int(local_max_price[i - 1]), int(local_max_price[i])
-        if df_temp["Close"].iloc[p2_idx].item() > df_temp["Close"].iloc[p1_idx].item() and \
-           df_temp["RSI"].iloc[p2_idx].item() < df_temp["RSI"].iloc[p1_idx].item():
-            if df_temp["RSI"].iloc[p2_idx].item() >= params['rsi_overbought']:
-                divergences.append((df_temp.index[p1_idx], df_temp.index[p2_idx], "bearish"))
-
-    #  매매 신호 생성 및 종합
-    signal = np.zeros(len(y))
-    for i in range(len(y)):
-        if np.isnan(y_pred[i]) or np.isnan(df_temp['band'].iloc[i]):
-            continue
-        if y[i] > y_pred[i] + df_temp['band'].iloc[i]:
-            signal[i] = -1
-        elif y[i] < y_pred[i] - df_temp['band'].iloc[i]:
-            signal[i] = 1
-        else:
-            signal[i] = 0
-
-    for _, date_p2, div_type in divergences:
-        if date_p2 in df_temp.index:
-            idx = df_temp.index.get_loc(date_p2)
-            if div_type == "bullish":
-                signal[idx] = 1
-            elif div_type == "bearish":
-                signal[idx] = -1
-
-    filtered_signal = np.zeros(len(signal))
-    last_signal = 0
-    for i in range(len(signal)):
-        if signal[i] != 0 and signal[i] != last_signal:
-            filtered_signal[i] = signal[i]
-            last_signal = signal[i]
-    df_temp['signal'] = filtered_signal
+    with stage(profiler, 'extrema'):
+        local_max_price, local_min_price = _extrema(cache, fingerprint, y, order)
+    with stage(profiler, 'divergence'):
+        p1, p2, kind = find_divergence_positions(y, df_temp["RSI"].to_numpy(), local_min_price, local_max_price,
+                                                 params['rsi_oversold'], params['rsi_overbought'])
+        divergences = to_date_tuples(df_temp.index, p1, p2, kind)
+
+    #  매매 신호 생성 및 종합 (다이버전스 p2 위치는 밴드 신호를 덮어씀: 강세 → 약세 순)
+    with stage(profiler, 'signals'):
+        signal = band_signals(y, y_pred, df_temp['band'].to_numpy())
+        apply_divergences(signal, p2, kind)
+        df_temp['signal'] = filter_signals(signal)
 
     # 백테스트 실행
+    with stage(profiler, 'trades'):
+        profit_pct, final_value, trades = simulate_trades(df_temp['Close'].to_numpy(), df_temp.index,
+                                                          df_temp['signal'].to_numpy(), initial_balance, fee)
+        if profiler is not None:
+            profiler.count('trades', len(trades))
+    trade_df = pd.DataFrame(trades)
+    return profit_pct, final_value, trade_df, df_temp, divergences
+
+
+# 필터링된 신호로 매매 시뮬레이션 (신호가 있는 시점만 순회하는 이벤트 기반 거래 장부)
+# i 시점 신호는 i+1 종가에 체결, 끝까지 보유 중이면 마지막 종가로 청산
+def simulate_trades(prices, dates, signals, initial_balance, fee=0.001):
     capital = initial_balance
     balance = capital
     position = 0
     buy_price = 0
     trades = []
-    dates = df_temp.index.to_list()
-    prices = df_temp['Close'].to_numpy()
-    signals = df_temp['signal'].to_numpy()
 
-    for i in range(len(df_temp) - 1):
+    for i in np.flatnonzero(signals[:-1]):
         price = prices[i + 1].item()
         date = dates[i + 1]
 
@@ -131,6 +146,218 @@ def run_backtest(df_input, params, initial_balance, fee=0.001):
         profit_pct = -100
     else:
         profit_pct = (final_value - capital) / capital * 100
+    return profit_pct, final_value, trades
 
-    trade_df = pd.DataFrame(trades)
-    return profit_pct, final_value, trade_df, df_temp, divergences
\ No newline at end of file
+
+# ===== 다중 파라미터 배치 백테스트 =====
+# 아래 헬퍼들은 마지막 축을 시간 축으로 보고 (파라미터 세트 × 시간) 2차원 배열을 그대로 처리한다.
+
+# 밴드 이탈 신호: 상단 돌파 -1, 하단 이탈 +1 (NaN 비교는 False → 0)
+def band_signals(y, y_pred, band):
+    return np.where(y > y_pred + band, -1.0, np.where(y < y_pred - band, 1.0, 0.0))
+
+
+# 같은 방향 신호 연속 제거: 직전 0 이 아닌 신호와 다를 때만 남김 (forward-fill 기반)
+def filter_signals(signal):
+    t = np.arange(signal.shape[-1])
+    nonzero = signal != 0
+    last_idx = np.maximum.accumulate(np.where(nonzero, t, -1), axis=-1)
+    prev_idx = np.concatenate([np.full(last_idx.shape[:-1] + (1,), -1), last_idx[..., :-1]], axis=-1)
+    prev = np.where(prev_idx >= 0, np.take_along_axis(signal, np.maximum(prev_idx, 0), axis=-1), 0.0)
+    return np.where(nonzero & (signal != prev), signal, 0.0)
+
+
+# 거래 이벤트 마스크: i 시점 신호는 i+1 종가에 체결, 첫 매수 이전의 매도 신호는 무시
+# (필터링된 신호는 부호가 번갈아 나오므로 첫 매수 이후의 신호는 모두 유효한 체결)
+def trade_events(filtered):
+    events = filtered.copy()
+    events[..., -1] = 0
+    started = np.cumsum(events == 1, axis=-1) > 0
+    buys = (events == 1) & started
+    sells = (events == -1) & started
+    return buys, sells
+
+
+# 최종 자산 = 초기 자본 × 체결 계수의 곱 (매수: (1-fee)/가격, 매도: 가격*(1-fee))
+def _simulate_final_values(prices, buys, sells, initial_balance, fee):
+    exec_prices = np.broadcast_to(np.concatenate([prices[..., 1:], prices[..., -1:]], axis=-1), buys.shape)
+    factors = np.ones(buys.shape)
+    factors[buys] = (1 - fee) / exec_prices[buys]
+    factors[sells] = exec_prices[sells] * (1 - fee)
+    open_position = buys.sum(axis=-1) > sells.sum(axis=-1)
+    final_values = initial_balance * np.prod(factors, axis=-1)
+    final_values = np.where(open_position, final_values * prices[..., -1] * (1 - fee), final_values)
+    trade_counts = buys.sum(axis=-1) + sells.sum(axis=-1) + open_position
+    return final_values, trade_counts
+
+
+# 배치 한 묶음의 (파라미터 세트 × 시간) 임시 배열 메모리 예산과, 동시에 살아 있는 float64 크기 배열 수
+# (밴드·필터링·체결 계수 단계에서 측정한 최대치 약 5.3 개에 여유를 둔 값)
+BATCH_MEMORY_BYTES = 256 * 1024 * 1024
+BATCH_TEMPORARIES = 8
+
+
+# 봉 수에 맞춘 묶음 크기: 긴 이력(예: 1M 봉)에서도 묶음당 임시 배열이 memory_bytes 안에 들도록
+def batch_chunk_size(n_bars, memory_bytes=BATCH_MEMORY_BYTES):
+    return max(1, memory_bytes // (8 * max(n_bars, 1) * BATCH_TEMPORARIES))
+
+
+# chunk_size 를 주지 않으면 batch_chunk_size(봉 수) 로 정한다
+def run_backtest_batch(df, param_sets, initial_balance, fee=0.001, cache=None, chunk_size=None):
+    param_sets = list(param_sets)
+    y = df['Close'].to_numpy().ravel().astype(float)
+    fingerprint = series_fingerprint(y) if cache is not None else None
+    n_bars = len(y)
+    chunk_size = chunk_size or batch_chunk_size(n_bars)
+
+    profit_pct = np.full(len(param_sets), -100.0)
+    final_value = np.zeros(len(param_sets))
+    trade_count = np.zeros(len(param_sets), dtype=int)
+
+    if n_bars:
+        vol = _volatility(cache, fingerprint, y)
+        for start in range(0, len(param_sets), chunk_size):
+            rows = [i for i in range(start, min(start + chunk_size, len(param_sets)))
+                    if int(param_sets[i]['kr_window']) < n_bars]
+            if not rows:
+                continue
+            chunk = [param_sets[i] for i in rows]
+            signal = _batch_signals(cache, fingerprint, y, vol, chunk)
+            buys, sells = trade_events(filter_signals(signal))
+            values, counts = _simulate_final_values(y, buys, sells, initial_balance, fee)
+            final_value[rows] = values
+            trade_count[rows] = counts
+            profit_pct[rows] = np.where(values == 0, -100.0, (values - initial_balance) / initial_balance * 100)
+
+    metrics = pd.DataFrame(param_sets)
+    metrics['profit_pct'] = profit_pct
+    metrics['final_value'] = final_value
+    metrics['trade_count'] = trade_count
+    return metrics
+
+
+# 파라미터 세트별 신호 행렬: 지표는 고유 설정마다 한 번만 계산하고 싼 단계만 2차원으로 처리
+def _batch_signals(cache, fingerprint, y, vol, chunk, kr_method="numpy", profiler=None):
+    kr_keys = [(int(p['kr_window']), float(p['kr_bandwidth'])) for p in chunk]
+    unique_kr = list(dict.fromkeys(kr_keys))
+    with stage(profiler, 'kernel_regression'):
+        y_preds = np.stack([_y_pred(cache, fingerprint, y, w, bw, kr_method, profiler) for w, bw in unique_kr])
+    y_pred = y_preds[[unique_kr.index(k) for k in kr_keys]]
+
+    with stage(profiler, 'band'):
+        bb_k = np.array([float(p['bb_k']) for p in chunk])
+        signal = band_signals(y, y_pred, bb_k[:, None] * vol)
+
+    # 다이버전스: (극값 오더, RSI 기간) 조합별 후보를 구한 뒤 과매도/과매수 임계값만 세트별로 비교
+    div_keys = [(int(p['extrema_order']), int(p['rsi_period'])) for p in chunk]
+    for order, period in dict.fromkeys(div_keys):
+        rows = np.array([i for i, k in enumerate(div_keys) if k == (order, period)])
+        with stage(profiler, 'rsi'):
+            rsi = _rsi(cache, fingerprint, y, period)
+        with stage(profiler, 'extrema'):
+            local_max_price, local_min_price = _extrema(cache, fingerprint, y, order)
+        with stage(profiler, 'divergence'):
+            oversold = np.array([float(chunk[i]['rsi_oversold']) for i in rows])
+            overbought = np.array([float(chunk[i]['rsi_overbought']) for i in rows])
+
+            _, idx = divergence_candidates(y, rsi, local_min_price, "bullish")
+            r, c = np.nonzero(rsi[idx][None, :] <= oversold[:, None])
+            signal[rows[r], idx[c]] = 1
+            _, idx = divergence_candidates(y, rsi, local_max_price, "bearish")
+            r, c = np.nonzero(rsi[idx][None, :] >= overbought[:, None])
+            signal[rows[r], idx[c]] = -1
+
+    return signal
+
+
+# ===== 지표만 필요한 경우의 빠른 경로 (최적화/배치 실행용) =====
+class BacktestMetrics:
+    __slots__ = ('profit_pct', 'final_value', 'trade_count', 'max_drawdown')
+
+    def __init__(self, profit_pct, final_value, trade_count, max_drawdown):
+        self.profit_pct = profit_pct
+        self.final_value = final_value
+        self.trade_count = trade_count
+        self.max_drawdown = max_drawdown
+
+    def __repr__(self):
+        return (f"BacktestMetrics(profit_pct={self.profit_pct:.4f}, final_value={self.final_value:.4f}, "
+                f"trade_count={self.trade_count}, max_drawdown={self.max_drawdown:.4f})")
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# DataFrame 복사/컬럼 추가/거래 내역 생성 없이 원시 float 배열로 수익률·거래 수·최대 낙폭만 계산
+# profit_pct / final_value 는 run_backtest 와 동일한 연산 순서를 따르므로 값이 정확히 일치한다.
+# trade_start: 이 위치 이전 봉의 신호는 무시 (앞부분은 지표 준비 구간으로만 사용, 워크포워드 폴드 평가용)
+def run_backtest_metrics(close, params, initial_balance, fee=0.001, kr_method="numpy", cache=None, profiler=None,
+                         trade_start=0):
+    if isinstance(close, (pd.DataFrame, pd.Series)):
+        close = close['Close'] if isinstance(close, pd.DataFrame) else close
+        close = close.to_numpy()
+    y = np.asarray(close, dtype=np.float64).ravel()
+    fingerprint = series_fingerprint(y) if cache is not None else None
+
+    if int(params['kr_window']) >= len(y):
+        return BacktestMetrics(-100, 0, 0, 0.0)
+
+    with stage(profiler, 'band'):
+        vol = _volatility(cache, fingerprint, y)
+    signal = _batch_signals(cache, fingerprint, y, vol, [params], kr_method, profiler)[0]
+    with stage(profiler, 'signals'):
+        if trade_start > 0:
+            signal = signal.copy()
+            signal[:trade_start] = 0
+        signals = filter_signals(signal)
+
+    with stage(profiler, 'trades'):
+        metrics = _simulate_metrics(y, signals, initial_balance, fee)
+    if profiler is not None:
+        profiler.count('trades', metrics.trade_count)
+    return metrics
+
+
+def _simulate_metrics(y, signals, initial_balance, fee):
+    balance = initial_balance
+    position = 0
+    trade_count = 0
+    exec_bars = []
+    cash_after = []
+    qty_after = []
+    for i in np.flatnonzero(signals[:-1]):
+        price = y[i + 1].item()
+        if signals[i] == 1 and position == 0:
+            position = balance * (1 - fee) / price
+            balance = 0
+        elif signals[i] == -1 and position > 0:
+            balance = position * price * (1 - fee)
+            position = 0
+        else:
+            continue
+        trade_count += 1
+        exec_bars.append(i + 1)
+        cash_after.append(balance)
+        qty_after.append(position)
+
+    # 보유 중 평가액(수량 × 종가) 기준 자산 곡선 → 최대 낙폭(%)
+    state = np.searchsorted(np.asarray(exec_bars, dtype=np.int64), np.arange(len(y)), side='right') - 1
+    cash = np.asarray([initial_balance] + cash_after, dtype=np.float64)[state + 1]
+    qty = np.asarray([0.0] + qty_after)[state + 1]
+    equity = np.where(qty > 0, qty * y, cash)
+
+    if position > 0:
+        balance = position * y[-1].item() * (1 - fee)
+        trade_count += 1
+        equity[-1] = balance
+
+    final_value = balance if balance > 0 else position * y[-1].item()
+    if final_value == 0:
+        profit_pct = -100
+    else:
+        profit_pct = (final_value - initial_balance) / initial_balance * 100
+
+    peak = np.fmax.accumulate(equity)
+    drawdown = np.where(peak > 0, (peak - equity) / peak, 0.0)
+    max_drawdown = float(np.nanmax(drawdown)) * 100
+    return BacktestMetrics(profit_pct, final_value, trade_count, max_drawdown)
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import itertools
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest_core import DEFAULT_PARAMS, run_backtest, run_backtest_batch
+from data_store import OHLCVStore, DEFAULT_STORE_DIR, provider_from_env
+from portfolio import evaluate_universe, split_stock_item
+
+# Streamlit 없이 실행하는 배치 실행기 (cron / 계산 노드용)
+#  - backtest: 종목 유니버스 × 파라미터 세트 전체를 백테스트
+#  - optimize: 종목별 Optuna 최적화 (전체 기간 또는 워크포워드 목적 함수)
+# 결과는 JSON Lines 로 한 줄씩 기록하고, 같은 출력 파일로 다시 실행하면 이미 기록된 작업은 건너뛴다.
+# 출력 파일 첫 줄은 실행 구간 헤더이며, 종료일을 생략하고 이어서 실행하면 헤더의 종료일을 그대로 쓴다.
+MODES = ("backtest", "optimize")
+
+
+def make_store(root=DEFAULT_STORE_DIR, provider=None):
+    return OHLCVStore(root, provider or provider_from_env())
+
+
+# ===== 단일 종목 API =====
+def load_close(ticker, start, end, store=None):
+    df = (store or make_store()).load(ticker, start, end)
+    return df['Close'].to_numpy(dtype=np.float64).ravel()
+
+
+def backtest_ticker(ticker, params, start, end, initial_balance=10000, fee=0.001, store=None):
+    df = (store or make_store()).load(ticker, start, end)
+    return run_backtest(df, params, initial_balance, fee)
+
+
+# 종목 하나의 Optuna 최적화 (직렬, 같은 파라미터 세트 재평가 생략)
+def optimize_close(close, n_trials, initial_balance=10000, fee=0.001, objective="full", n_folds=5, pruner="median",
+                   seed=None, study=None):
+    import optuna
+    from backtest_core import run_backtest_metrics
+    from indicator_cache import IndicatorCache
+    from optimizer import suggest_params, cached_objective, walk_forward_objective, make_pruner
+
+    close = np.asarray(close, dtype=np.float64).ravel()
+    cache = IndicatorCache(maxsize=128)
+    if study is None:
+        study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed),
+                                    pruner=make_pruner(pruner) if objective == "walk_forward" else None)
+    if objective == "walk_forward":
+        func = walk_forward_objective(close, initial_balance, fee, n_folds=n_folds, cache=cache)
+    else:
+        def func(trial):
+            return run_backtest_metrics(close, suggest_params(trial), initial_balance, fee, cache=cache).profit_pct
+    study.optimize(cached_objective(study, func), n_trials=n_trials)
+    return study
+
+
+# ===== 파라미터 명세 =====
+# dict: 값이 리스트인 항목끼리 곱집합(그리드), list: 파라미터 세트 목록. 빠진 항목은 DEFAULT_PARAMS 로 채운다.
+def expand_param_spec(spec):
+    if spec is None:
+        return [dict(DEFAULT_PARAMS)]
+    if isinstance(spec, dict):
+        names = list(spec)
+        grids = [v if isinstance(v, list) else [v] for v in spec.values()]
+        spec = [dict(zip(names, values)) for values in itertools.product(*grids)]
+    unknown = sorted({name for params in spec for name in params} - set(DEFAULT_PARAMS))
+    if unknown:
+        raise ValueError(f"알 수 없는 파라미터: {', '.join(unknown)}")
+    return [{**DEFAULT_PARAMS, **params} for params in spec]
+
+
+def load_param_spec(path):
+    with open(path, encoding="utf-8") as f:
+        return expand_param_spec(json.load(f))
+
+
+# 작업 식별자: 종목 + 모드 + 설정(파라미터 세트 또는 최적화 설정)의 해시
+def job_id(ticker, mode, config):
+    digest = hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=8).hexdigest()
+    return f"{ticker}|{mode}|{digest}"
+
+
+# ===== 종목별 작업 (프로세스 풀에서 실행되므로 최상위 함수) =====
+def _backtest_job(close, param_sets, initial_balance, fee):
+    metrics = run_backtest_batch(pd.DataFrame({'Close': close}), param_sets, initial_balance, fee)
+    return {'results': [{'params': params, 'profit_pct': float(row.profit_pct), 'final_value': float(row.final_value),
+                         'trade_count': int(row.trade_count)}
+                        for params, row in zip(param_sets, metrics.itertuples())]}
+
+
+def _optimize_job(close, config, initial_balance, fee):
+    import optuna
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optimize_close(close, config['n_trials'], initial_balance, fee, objective=config['objective'],
+                           n_folds=config['n_folds'], pruner=config['pruner'], seed=config['seed'])
+    states = [t.state.name for t in study.trials]
+    best = study.best_trial
+    return {'results': [{'params': config, 'best_params': best.params, 'best_value': best.value,
+                         'oos_profit_pct': best.user_attrs.get('oos_profit_pct'),
+                         'fold_profits': best.user_attrs.get('fold_profits'),
+                         'completed': states.count("COMPLETE"), 'pruned': states.count("PRUNED")}]}
+
+
+# ===== 체크포인트 (JSON Lines 출력 파일 자체) =====
+# 중단으로 마지막 줄이 잘렸으면 잘라내고, 오류 없이 기록된 작업 식별자 집합을 돌려준다.
+def load_checkpoint(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_bytes += len(line)
+            if record.get('job') and not record.get('error'):
+                done.add(record['job'])
+    if good_bytes < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+# 출력 파일 첫 줄의 헤더 ({'mode', 'start', 'end', 'created'}), 없으면 None
+def load_checkpoint_header(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        try:
+            record = json.loads(f.readline())
+        except ValueError:
+            return None
+    return record.get('header') if isinstance(record, dict) else None
+
+
+def _json_safe(value):
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return _json_safe(value.item())
+    return value
+
+
+# 배치 실행: 완료된 결과 레코드를 yield (output 이 주어지면 한 줄씩 기록하고 체크포인트에서 이어서 실행)
+# end 가 None 이면 체크포인트 헤더의 종료일, 새 출력 파일이면 오늘 → 다른 날 이어서 실행해도 작업 식별자가 같다.
+def run_batch(tickers, mode, start, end=None, param_sets=None, optimize_config=None, initial_balance=10000, fee=0.001,
+              output=None, store=None, load_workers=8, workers=None):
+    if mode not in MODES:
+        raise ValueError(f"mode 는 {MODES} 중 하나여야 합니다.")
+    if mode == "backtest":
+        config = param_sets if param_sets is not None else expand_param_spec(None)
+        job_configs = config
+        evaluate = _backtest_job
+    else:
+        config = {'n_trials': 100, 'objective': "full", 'n_folds': 5, 'pruner': "median", 'seed': None,
+                  **(optimize_config or {})}
+        job_configs = [config]
+        evaluate = _optimize_job
+    header = load_checkpoint_header(output) if output else None
+    if end is None:
+        end = header['end'] if header else datetime.now().strftime("%Y-%m-%d")
+    window = {'start': str(pd.Timestamp(start).date()), 'end': str(pd.Timestamp(end).date())}
+
+    def ids(ticker):
+        return [job_id(ticker, mode, {**window, **c}) for c in job_configs]
+
+    done = load_checkpoint(output) if output else set()
+    pending = [t for t in tickers if not all(j in done for j in ids(split_stock_item(t)[0]))]
+
+    out = open(output, "a", encoding="utf-8") if output else None
+    if out is not None and out.tell() == 0:
+        header = {'mode': mode, **window, 'created': datetime.now().isoformat(timespec='seconds')}
+        out.write(json.dumps({'header': header}, ensure_ascii=False) + "\n")
+    try:
+        for record in evaluate_universe(pending, config, start, end, initial_balance, fee, store=store or make_store(),
+                                        load_workers=load_workers, backtest_workers=workers, evaluate=evaluate):
+            base = {'mode': mode, 'ticker': record['ticker'], 'name': record['name'], **window,
+                    'bars': record['bars'], 'finished': datetime.now().isoformat(timespec='seconds')}
+            if record['error']:
+                lines = [{**base, 'job': None, 'error': record['error']}]
+            else:
+                lines = [{**base, 'job': job, **result, 'error': None}
+                         for job, result in zip(ids(record['ticker']), record['results'])
+                         if job not in done]
+            for line in lines:
+                line = _json_safe(line)
+                if out is not None:
+                    out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                yield line
+            if out is not None:
+                # 종목 단위로 디스크에 반영 → 중단되어도 끝난 종목은 다시 계산하지 않음
+                out.flush()
+                os.fsync(out.fileno())
+    finally:
+        if out is not None:
+            out.close()
+
+
+def _read_tickers(args):
+    tickers = list(args.tickers or [])
+    if args.universe:
+        with open(args.universe, encoding="utf-8") as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return list(dict.fromkeys(tickers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="헤드리스 배치 백테스트/최적화 실행기 (JSON Lines 출력, 중단 후 이어서 실행)")
+    parser.add_argument("mode", choices=MODES, help="backtest: 파라미터 세트 전수 백테스트, optimize: 종목별 Optuna 최적화")
+    parser.add_argument("--tickers", nargs="+", help="종목 티커 목록")
+    parser.add_argument("--universe", help="종목 목록 파일 (한 줄에 하나, '#' 주석 허용)")
+    parser.add_argument("--start", default="1990-01-01", help="시작일")
+    parser.add_argument("--end", help="종료일 (미포함, 기본: 이어서 실행하면 출력 파일 헤더의 종료일, 아니면 오늘)")
+    parser.add_argument("--params", help="backtest 파라미터 명세 JSON (dict: 그리드, list: 세트 목록)")
+    parser.add_argument("--trials", type=int, default=100, help="optimize 종목별 시도 횟수")
+    parser.add_argument("--objective", choices=("full", "walk_forward"), default="full", help="optimize 목적 함수")
+    parser.add_argument("--folds", type=int, default=5, help="워크포워드 폴드 수")
+    parser.add_argument("--seed", type=int, help="TPE 샘플러 시드")
+    parser.add_argument("--initial-balance", type=float, default=10000, help="시작 자본금")
+    parser.add_argument("--fee", type=float, default=0.001, help="거래 수수료율")
+    parser.add_argument("--workers", type=int, help="백테스트/최적화 프로세스 수 (기본: CPU 수, 1 이면 현재 프로세스)")
+    parser.add_argument("--load-workers", type=int, default=8, help="동시 데이터 로딩 수")
+    parser.add_argument("--output", required=True, help="결과 JSON Lines 경로 (있으면 이어서 실행)")
+    args = parser.parse_args(argv)
+
+    tickers = _read_tickers(args)
+    if not tickers:
+        parser.error("--tickers 또는 --universe 로 종목을 지정하세요.")
+    try:
+        param_sets = load_param_spec(args.params) if args.params else None
+    except ValueError as e:
+        parser.error(str(e))
+    optimize_config = {'n_trials': args.trials, 'objective': args.objective, 'n_folds': args.folds, 'seed': args.seed}
+
+    failed = 0
+    for line in run_batch(tickers, args.mode, args.start, args.end, param_sets=param_sets,
+                          optimize_config=optimize_config, initial_balance=args.initial_balance, fee=args.fee,
+                          output=args.output, load_workers=args.load_workers, workers=args.workers):
+        if line['error']:
+            failed += 1
+            print(f"{line['ticker']}: 오류 - {line['error']}", file=sys.stderr)
+        elif args.mode == "backtest":
+            print(f"{line['ticker']}: {line['profit_pct']:.2f}% ({line['trade_count']}회 거래)")
+        else:
+            print(f"{line['ticker']}: 최고 {line['best_value']:.2f}% {line['best_params']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
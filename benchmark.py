@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest_core import (DEFAULT_PARAMS, compute_rsi, run_backtest, run_backtest_metrics, find_divergences,
+                           simulate_trades, band_signals, filter_signals)
+from kernel_regression import kernel_regression
+from divergence import local_extrema
+from data_store import OHLCVStore, SyntheticProvider, synthetic_prices, to_panel
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_RESULTS = "benchmark_results.json"
+# 머신마다 --save-baseline 으로 만드는 기준 결과 (실행 위치와 관계없이 이 파일 옆, 커밋하지 않음)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# 이 값이 기준 결과와 다르면 처리량을 비교할 수 없으므로 회귀 검사를 건너뛴다
+BASELINE_META_KEYS = ("cpu_count", "python", "numpy")
+# 이보다 적게 느려진 항목은 측정 잡음으로 보고 회귀로 세지 않는다 (초)
+MIN_REGRESSION_SECONDS = 0.005
+# 콜드 스타트 측정 대상 (app.py 첫 실행 시 불러오는 순서)
+STARTUP_MODULES = ["streamlit", "backtest_core", "optimizer", "ui_components"]
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def _time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# 단계별 벤치마크: 앞 단계 결과를 미리 계산해 두고 각 단계만 따로 측정
+def stage_benchmarks(n_bars, params, repeat, initial_balance=10000, fee=0.001):
+    df = synthetic_prices(n_bars)
+    y = df['Close'].to_numpy()
+    window, order = int(params['kr_window']), int(params['extrema_order'])
+
+    rsi = compute_rsi(df['Close'], params['rsi_period']).to_numpy()
+    y_pred = kernel_regression(y, window, params['kr_bandwidth'])
+    band = params['bb_k'] * pd.Series(y).rolling(20).std().to_numpy()
+    df_temp = df.assign(RSI=rsi, y_pred=y_pred, band=band)
+    signal = band_signals(y, y_pred, band)
+    filtered = filter_signals(signal)
+
+    def extrema_divergence():
+        local_max, local_min = local_extrema(y, order)
+        return find_divergences(df_temp, local_min, local_max, params)
+
+    stages = {
+        'rsi': lambda: compute_rsi(df['Close'], params['rsi_period']),
+        'kernel_regression': lambda: kernel_regression(y, window, params['kr_bandwidth']),
+        'band': lambda: band_signals(y, y_pred, params['bb_k'] * pd.Series(y).rolling(20).std().to_numpy()),
+        'extrema_divergence': extrema_divergence,
+        'signal_filter': lambda: filter_signals(signal),
+        'trade_simulation': lambda: simulate_trades(y, df.index, filtered, initial_balance, fee),
+        'run_backtest': lambda: run_backtest(df, params, initial_balance, fee),
+        'run_backtest_metrics': lambda: run_backtest_metrics(y, params, initial_balance, fee),
+    }
+    return {name: _time(func, repeat) for name, func in stages.items()}
+
+
+# Optuna 목적 함수 1회 (UI 와 같은 탐색 공간/지표 함수)
+def objective_benchmark(n_bars, params, repeat, initial_balance=10000, fee=0.001):
+    import optuna
+    from optimizer import suggest_params
+
+    close = synthetic_prices(n_bars)['Close'].to_numpy()
+    trial = optuna.trial.FixedTrial(params)
+    return _time(lambda: run_backtest_metrics(close, suggest_params(trial), initial_balance, fee), repeat)
+
+
+# 다종목 평균 수익률 계산 (합성 제공자 + 임시 저장소, 저장소가 채워진 뒤의 반복 실행 기준)
+def average_profit_benchmark(n_tickers, params, repeat, workers=1, initial_balance=10000, fee=0.001):
+    from portfolio import evaluate_universe
+
+    tickers = [f"SYN{i:03d}" for i in range(n_tickers)]
+    with tempfile.TemporaryDirectory() as root:
+        store = OHLCVStore(root, SyntheticProvider())
+
+        def run():
+            results = list(evaluate_universe(tickers, params, "1990-01-01", "2023-05-31", initial_balance, fee,
+                                             store=store, backtest_workers=workers))
+            return sum(r['bars'] for r in results)
+
+        n_bars = run()
+        return _time(run, repeat), n_bars
+
+
+# 같은 종목들을 공통 날짜 축의 패널로 한 번에 백테스트 (공유 자본 포트폴리오 시뮬레이션 포함)
+def panel_benchmark(n_tickers, params, repeat, initial_balance=10000, fee=0.001):
+    from panel import run_panel_backtest
+
+    provider = SyntheticProvider()
+    frames = {f"SYN{i:03d}": provider.fetch(f"SYN{i:03d}", "1990-01-01", "2023-05-31") for i in range(n_tickers)}
+    prices = to_panel(frames)
+    seconds = _time(lambda: run_panel_backtest(prices, params, initial_balance, fee), repeat)
+    return seconds, int(prices.notna().to_numpy().sum())
+
+
+# 새 인터프리터에서 모듈 하나를 import 하는 데 걸리는 시간 (컨테이너 재시작 직후와 같은 조건)
+def _cold_import(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(APP_PATH))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+# 콜드 스타트(모듈별 import 시간)와 Streamlit 재실행(기본 페이지 rerun) 지연 시간
+def startup_benchmarks(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    timings = {f"import:{module}": min(_cold_import(module) for _ in range(repeat)) for module in STARTUP_MODULES}
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    timings['app_rerun'] = _time(app.run, repeat)
+    return timings
+
+
+def run_benchmarks(sizes, params=DEFAULT_PARAMS, repeat=3, n_tickers=19, workers=1, startup=True, log=print):
+    results = []
+    if startup:
+        for name, seconds in startup_benchmarks(repeat).items():
+            results.append({'benchmark': name, 'bars': 0, 'seconds': seconds, 'bars_per_sec': None})
+            log(f"{name:<22} {'':>10}       {seconds * 1000:>10.2f} ms")
+
+    for n_bars in sizes:
+        # 큰 입력은 1회만 측정
+        rep = repeat if n_bars <= 100_000 else 1
+        timings = stage_benchmarks(n_bars, params, rep)
+        timings['optuna_objective'] = objective_benchmark(n_bars, params, rep)
+        for name, seconds in timings.items():
+            results.append({'benchmark': name, 'bars': n_bars, 'seconds': seconds,
+                            'bars_per_sec': n_bars / seconds if seconds > 0 else float('inf')})
+            log(f"{name:<22} {n_bars:>10,d} bars  {seconds * 1000:>10.2f} ms  {n_bars / max(seconds, 1e-12):>14,.0f} bars/s")
+
+    if n_tickers:
+        seconds, n_bars = average_profit_benchmark(n_tickers, params, repeat, workers)
+        results.append({'benchmark': 'average_profit', 'bars': n_bars, 'tickers': n_tickers, 'seconds': seconds,
+                        'bars_per_sec': n_bars / seconds if seconds > 0 else float('inf')})
+        log(f"{'average_profit':<22} {n_bars:>10,d} bars  {seconds * 1000:>10.2f} ms  ({n_tickers} tickers)")
+        seconds, n_bars = panel_benchmark(n_tickers, params, repeat)
+        results.append({'benchmark': 'panel_backtest', 'bars': n_bars, 'tickers': n_tickers, 'seconds': seconds,
+                        'bars_per_sec': n_bars / seconds if seconds > 0 else float('inf')})
+        log(f"{'panel_backtest':<22} {n_bars:>10,d} bars  {seconds * 1000:>10.2f} ms  ({n_tickers} tickers)")
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'params': params,
+        },
+        'results': results,
+    }
+
+
+# 처리량: 봉 단위 항목은 bars/s, 시작 시간 항목(bars=0)은 초당 실행 횟수
+def _throughput(result):
+    return result['bars_per_sec'] or 1 / max(result['seconds'], 1e-12)
+
+
+# 측정 환경이 기준 결과와 다른 항목: {키: (기준 값, 현재 값)}
+def meta_mismatch(current, baseline):
+    return {key: (baseline['meta'].get(key), current['meta'].get(key)) for key in BASELINE_META_KEYS
+            if baseline['meta'].get(key) != current['meta'].get(key)}
+
+
+# 기준 결과 대비 처리량이 tolerance 이상 떨어지고 실행 시간이 min_seconds 이상 늘어난 항목 목록
+def compare_to_baseline(current, baseline, tolerance=0.2, min_seconds=MIN_REGRESSION_SECONDS):
+    base = {(r['benchmark'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        ref = base.get((r['benchmark'], r['bars']))
+        if ref is None or r['seconds'] - ref['seconds'] < min_seconds:
+            continue
+        ratio = _throughput(r) / _throughput(ref)
+        if ratio < 1 - tolerance:
+            regressions.append({'benchmark': r['benchmark'], 'bars': r['bars'],
+                                'baseline_seconds': ref['seconds'], 'seconds': r['seconds'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="backtest_core 단계별 성능 벤치마크 (합성 GBM 데이터, 오프라인)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="입력 길이(봉 수) 목록")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 측정 횟수 (최솟값 사용)")
+    parser.add_argument("--tickers", type=int, default=19, help="다종목 평균 벤치마크 종목 수 (0 이면 생략)")
+    parser.add_argument("--workers", type=int, default=1, help="다종목 평균 벤치마크 백테스트 워커 수")
+    parser.add_argument("--skip-startup", action="store_true", help="콜드 스타트/재실행 지연 측정 생략")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="결과 JSON 경로")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="비교할 기준 결과 JSON 경로")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 처리량 감소 비율 (0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=MIN_REGRESSION_SECONDS,
+                        help="회귀로 볼 최소 실행 시간 증가 (초, 짧은 항목의 측정 잡음 제외)")
+    parser.add_argument("--save-baseline", action="store_true", help="이번 결과를 기준 결과로 저장")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes, repeat=args.repeat, n_tickers=args.tickers, workers=args.workers,
+                             startup=not args.skip_startup)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"결과 저장: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"기준 결과 저장: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # 기준 없이 통과하면 회귀 검사가 아무것도 비교하지 않은 채 성공하므로 실패로 처리
+        print(f"오류: 기준 결과({args.baseline})가 없어 성능 회귀를 검사하지 못했습니다. "
+              f"--save-baseline 으로 먼저 저장하세요.", file=sys.stderr)
+        return 2
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    mismatch = meta_mismatch(current, baseline)
+    if mismatch:
+        details = ", ".join(f"{key}: {old} → {new}" for key, (old, new) in mismatch.items())
+        print(f"기준 결과와 측정 환경이 달라 성능 회귀 검사를 건너뜁니다 ({details}). "
+              f"이 머신에서 --save-baseline 으로 기준을 다시 저장하세요.")
+        return 0
+    regressions = compare_to_baseline(current, baseline, args.tolerance, args.min_seconds)
+    for r in regressions:
+        print(f"성능 저하: {r['benchmark']} ({r['bars']:,d} bars) "
+              f"{r['baseline_seconds'] * 1000:,.2f} → {r['seconds'] * 1000:,.2f} ms ({r['ratio']:.0%})")
+    if regressions:
+        return 1
+    print("기준 대비 성능 저하 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import io
+import os
+import hashlib
+import functools
+
+import numpy as np
+import pandas as pd
+
+CHART_COLUMNS = ['Close', 'y_pred', 'band', 'signal', 'RSI']
+MAX_POINTS = 2000
+
+# ===== 한글 폰트 설정 =====
+# 설치된 후보 중 첫 번째 폰트를 사용 (Windows: 맑은 고딕, macOS: AppleGothic, Linux: 나눔/Noto 계열)
+# BACKTEST_FONT_PATH 로 폰트 파일을 직접 지정할 수 있고, 후보가 하나도 없으면 matplotlib 기본 폰트를 사용한다.
+KOREAN_FONTS = ["Malgun Gothic", "AppleGothic", "NanumGothic", "NanumBarunGothic",
+                "Noto Sans CJK KR", "Noto Sans KR", "UnDotum"]
+
+
+@functools.lru_cache(maxsize=None)
+def setup_korean_font():
+    import matplotlib
+    import matplotlib.font_manager as fm
+
+    font_path = os.environ.get("BACKTEST_FONT_PATH")
+    if font_path and os.path.exists(font_path):
+        fm.fontManager.addfont(font_path)
+        matplotlib.rcParams["font.family"] = fm.FontProperties(fname=font_path).get_name()
+    else:
+        installed = {f.name for f in fm.fontManager.ttflist}
+        font_name = next((name for name in KOREAN_FONTS if name in installed), None)
+        if font_name is not None:
+            matplotlib.rcParams["font.family"] = font_name
+    matplotlib.rcParams["axes.unicode_minus"] = False
+# =========================
+
+
+# LTTB(Largest-Triangle-Three-Buckets) 다운샘플링: 모양을 유지하는 n_out 개 점의 위치를 반환
+# NaN 구간은 건너뛰고, 첫 점과 마지막 점은 항상 포함한다.
+def lttb_indices(y, n_out):
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y))
+    n = len(finite)
+    if n_out >= n or n_out < 3:
+        return finite
+
+    x, v = finite.astype(np.float64), y[finite]
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), v[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (v[lo:hi] - v[a]) - (x[a] - x[lo:hi]) * (avg_y - v[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return finite[selected]
+
+
+# 가격 패널: 종가·밴드 상단·밴드 하단 각각의 LTTB 결과를 합쳐 같은 x 위치에서 그린다 (fill_between 정렬 유지)
+def _price_indices(frame, max_points):
+    close = frame['Close'].to_numpy(dtype=np.float64)
+    if len(close) <= max_points:
+        return np.arange(len(close))
+    upper = (frame['y_pred'] + frame['band']).to_numpy(dtype=np.float64)
+    lower = (frame['y_pred'] - frame['band']).to_numpy(dtype=np.float64)
+    n_out = max_points // 3
+    return np.union1d(np.union1d(lttb_indices(close, n_out), lttb_indices(upper, n_out)), lttb_indices(lower, n_out))
+
+
+def _rsi_indices(frame, max_points):
+    rsi = frame['RSI'].to_numpy(dtype=np.float64)
+    if len(rsi) <= max_points:
+        return np.arange(len(rsi))
+    return lttb_indices(rsi, max_points)
+
+
+# 매매 신호 마커: 구간이 max_points 봉보다 길면 같은 화면 구간(봉 수/max_points)에 겹치는 마커는 하나만 그린다
+def _thin_markers(positions, n_bars, max_points):
+    if n_bars <= max_points or len(positions) == 0:
+        return positions
+    bucket = positions * max_points // n_bars
+    return positions[np.r_[True, bucket[1:] != bucket[:-1]]]
+
+
+# 결과 지문: 차트에 쓰이는 컬럼 + 인덱스 + 다이버전스 목록 기준
+def result_fingerprint(result_df, divergences):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(result_df[CHART_COLUMNS], index=True).to_numpy().tobytes())
+    digest.update(repr(divergences).encode())
+    return digest.hexdigest()
+
+
+# 다이버전스를 종류별로 한 번의 LineCollection 으로 그림
+def _draw_divergences(ax, x, values, positions):
+    from matplotlib.collections import LineCollection
+
+    for kind, color, label in (("bullish", 'lime', '강세 다이버전스'), ("bearish", 'magenta', '약세 다이버전스')):
+        pairs = positions.get(kind)
+        if pairs is None or len(pairs) == 0:
+            continue
+        p1, p2 = pairs[:, 0], pairs[:, 1]
+        segments = np.stack([np.column_stack([x[p1], values[p1]]), np.column_stack([x[p2], values[p2]])], axis=1)
+        ax.add_collection(LineCollection(segments, colors=color, linestyles='--', linewidths=2, label=label))
+
+
+def _divergence_positions(index, divergences):
+    positions = {}
+    for kind in ("bullish", "bearish"):
+        dates = [(p1, p2) for p1, p2, div_type in divergences if div_type == kind]
+        if not dates:
+            continue
+        p1 = index.get_indexer([d[0] for d in dates])
+        p2 = index.get_indexer([d[1] for d in dates])
+        inside = (p1 >= 0) & (p2 >= 0)
+        positions[kind] = np.column_stack([p1[inside], p2[inside]])
+    return positions
+
+
+def _render(result_df, divergences, title, price_label, rsi_levels, viewport, max_points, dpi):
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+
+    setup_korean_font()
+    frame = result_df if viewport is None else result_df.loc[viewport[0]:viewport[1]]
+    index = frame.index
+    x = mdates.date2num(index) if isinstance(index, pd.DatetimeIndex) else np.arange(len(index), dtype=np.float64)
+    close = frame['Close'].to_numpy(dtype=np.float64)
+    rsi = frame['RSI'].to_numpy(dtype=np.float64)
+    y_pred = frame['y_pred'].to_numpy(dtype=np.float64)
+    band = frame['band'].to_numpy(dtype=np.float64)
+    signal = frame['signal'].to_numpy()
+    positions = _divergence_positions(index, divergences)
+
+    fig = Figure(figsize=(14, 12))
+    ax1, ax2 = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+
+    idx = _price_indices(frame, max_points)
+    ax1.plot(x[idx], close[idx], color='blue', label=price_label)
+    ax1.plot(x[idx], y_pred[idx], color='orange', linestyle='--', label='커널 회귀 예측')
+    ax1.fill_between(x[idx], y_pred[idx] - band[idx], y_pred[idx] + band[idx], color='gray', alpha=0.2,
+                     label='변동성 밴드')
+    buy_idx = _thin_markers(np.flatnonzero(signal == 1), len(frame), max_points)
+    sell_idx = _thin_markers(np.flatnonzero(signal == -1), len(frame), max_points)
+    ax1.scatter(x[buy_idx], close[buy_idx], marker='^', color='green', label='매수 신호', alpha=0.8, s=100)
+    ax1.scatter(x[sell_idx], close[sell_idx], marker='v', color='red', label='매도 신호', alpha=0.8, s=100)
+    _draw_divergences(ax1, x, close, positions)
+    ax1.set_title(title)
+    ax1.legend()
+    ax1.grid(True)
+    ax1.tick_params(labelbottom=True)
+
+    idx = _rsi_indices(frame, max_points)
+    ax2.plot(x[idx], rsi[idx], label="RSI", color="blue")
+    ax2.axhline(rsi_levels[0], color="red", linestyle="--", alpha=0.5, label='과매수')
+    ax2.axhline(rsi_levels[1], color="green", linestyle="--", alpha=0.5, label='과매도')
+    _draw_divergences(ax2, x, rsi, positions)
+    ax2.set_title("RSI")
+    ax2.legend()
+    ax2.grid(True)
+
+    if isinstance(index, pd.DatetimeIndex):
+        ax2.xaxis_date()
+    ax1.autoscale_view()
+    ax2.autoscale_view()
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+# 가격/RSI 차트를 PNG 로 렌더링
+# viewport=(시작일, 종료일) 이면 해당 구간만 잘라 그린다. 구간의 봉 수가 max_points 이하이면 원본 해상도,
+# 넘으면 LTTB 로 줄인다. cache(IndicatorCache)를 주면 (결과 지문, 구간, 표시 옵션) 기준으로 이미지를 재사용한다.
+def render_backtest_chart(result_df, divergences, title, price_label, rsi_levels, viewport=None,
+                          max_points=MAX_POINTS, dpi=100, cache=None):
+    rsi_levels = tuple(float(level) for level in rsi_levels)
+    if viewport is not None:
+        viewport = (pd.Timestamp(viewport[0]), pd.Timestamp(viewport[1]))
+
+    def compute():
+        return _render(result_df, divergences, title, price_label, rsi_levels, viewport, max_points, dpi)
+
+    if cache is None:
+        return compute()
+    key = ('chart', result_fingerprint(result_df, divergences), viewport, title, price_label, rsi_levels,
+           max_points, dpi)
+    return cache.get_or_compute(key, compute)
@@ -1,9 +1,27 @@
-import yfinance as yf
 import streamlit as st
-import pandas as pd
+from data_store import OHLCVStore, DEFAULT_STORE_DIR, provider_from_env, normalize_ohlcv
 
-@st.cache_data
+_store = None
+
+
+def configure_store(root=DEFAULT_STORE_DIR, provider=None):
+    global _store
+    _store = OHLCVStore(root, provider or provider_from_env())
+    return _store
+
+
+def get_store():
+    if _store is None:
+        configure_store()
+    return _store
+
+
+# 재시도까지 실패하면 오류를 표시하고 빈 DataFrame 반환 (호출부의 '데이터 없음' 처리로 이어짐)
 def load_data(ticker, start, end):
-    with st.spinner(f"'{ticker}' 데이터 다운로드 중..."):
-        df_data = yf.download(ticker, start=start, end=end, auto_adjust=True)
-    return df_data
\ No newline at end of file
+    with st.spinner(f"'{ticker}' 데이터 불러오는 중..."):
+        try:
+            df_data = get_store().load(ticker, start, end)
+        except Exception as e:
+            st.error(f"'{ticker}' 데이터를 받지 못했습니다: {e}")
+            df_data = normalize_ohlcv(None)
+    return df_data
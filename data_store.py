@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import time
+import zlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_STORE_DIR = os.environ.get(
+    "BACKTEST_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ohlcv_cache"))
+# 최근 구간(뒤쪽) 재요청 간격 (초): 이 시간 안의 재실행은 저장된 데이터만 읽는다
+FRESH_SECONDS = 3600
+
+
+# 제공자별 응답을 (DatetimeIndex × OHLCV 평면 컬럼, float64) 형태로 통일
+def normalize_ohlcv(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype=np.float64)
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df[[c for c in OHLCV_COLUMNS if c in df.columns]].astype(np.float64)
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.normalize().rename('Date')
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+def _to_timestamp(value):
+    ts = pd.Timestamp(value)
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+    return ts.normalize()
+
+
+# ===== 데이터 제공자 =====
+# fetch(ticker, start, end) → [start, end) 구간 일봉 DataFrame (end 미포함, yfinance 규칙과 동일)
+# 규칙: 다운로드 실패(네트워크·속도 제한 등)는 예외, 데이터가 없는 구간(상장 전·상장 폐지·없는 종목)은 빈 DataFrame.
+# 저장소는 빈 응답을 "그 구간에는 데이터가 없음" 으로 기록하고, 예외는 RetryingProvider 가 재시도한다.
+class YFinanceProvider:
+    def fetch(self, ticker, start, end):
+        import warnings
+        import yfinance as yf
+        from yfinance.exceptions import YFPricesMissingError, YFTzMissingError, YFTickerMissingError
+
+        # yf.download 는 실패해도 빈 DataFrame 만 돌려주므로 오류를 구분할 수 있는 Ticker.history 사용
+        # (raise_errors 는 yfinance 1.x 에서 사용 중단 경고만 내고 동작은 같음)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                df = yf.Ticker(ticker).history(start=start, end=end, auto_adjust=True, raise_errors=True)
+        except (YFPricesMissingError, YFTzMissingError, YFTickerMissingError):
+            return normalize_ohlcv(None)
+        return normalize_ohlcv(df)
+
+
+# 로컬 파일 기반 대체 제공자 (오프라인 테스트용): directory/<ticker>.csv (Date 인덱스 + OHLCV 컬럼)
+class CSVProvider:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start, end):
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return normalize_ohlcv(None)
+        df = normalize_ohlcv(pd.read_csv(path, index_col=0, parse_dates=True))
+        return df[(df.index >= _to_timestamp(start)) & (df.index < _to_timestamp(end))]
+
+
+# 기하 브라운 운동(GBM) 합성 종가 — 시드가 같으면 항상 같은 경로
+def synthetic_prices(n_bars, seed=0, s0=100.0, mu=0.0003, sigma=0.02):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(mu - 0.5 * sigma ** 2, sigma, n_bars)
+    close = s0 * np.exp(np.cumsum(returns))
+    index = pd.bdate_range("1990-01-01", periods=n_bars, name='Date')
+    return pd.DataFrame({'Close': close}, index=index)
+
+
+# 오프라인 데이터 제공자: 티커 이름으로 시드를 정해 GBM 일봉을 생성
+class SyntheticProvider:
+    def fetch(self, ticker, start, end):
+        index = pd.bdate_range(start, end, inclusive='left', name='Date')
+        close = synthetic_prices(len(index), seed=zlib.crc32(ticker.encode()))['Close'].to_numpy()
+        df = pd.DataFrame({c: close for c in OHLCV_COLUMNS}, index=index)
+        df['Volume'] = 1e6
+        return df
+
+
+# 네트워크 흉내 제공자 (오프라인 테스트용): 요청마다 지연을 주고 일정 확률로 ConnectionError 를 낸다.
+# fail_tickers 의 종목은 항상 실패한다. calls 에 종목별 요청 횟수를 기록한다.
+class SimulatedProvider:
+    def __init__(self, provider=None, latency=0.05, jitter=0.05, failure_rate=0.2, fail_tickers=(), seed=0):
+        self.provider = provider or SyntheticProvider()
+        self.latency, self.jitter, self.failure_rate = latency, jitter, failure_rate
+        self.fail_tickers = set(fail_tickers)
+        self.calls = {}
+        self._rng = random.Random(seed)
+        self._guard = threading.Lock()
+
+    def fetch(self, ticker, start, end):
+        with self._guard:
+            self.calls[ticker] = self.calls.get(ticker, 0) + 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failed = ticker in self.fail_tickers or self._rng.random() < self.failure_rate
+        time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"{ticker}: 모의 네트워크 오류")
+        return self.provider.fetch(ticker, start, end)
+
+
+# 재시도·속도 제한 래퍼
+#  - 동시 요청 수를 max_connections 로 제한
+#  - 같은 종목의 연속 요청(재시도 포함) 사이에 최소 min_interval 초 간격
+#  - 예외가 나면 지수 백오프(backoff × 2^n, 최대 max_backoff, 지터 포함)로 retries 번까지 재시도
+class RetryingProvider:
+    def __init__(self, provider, retries=3, backoff=0.5, max_backoff=8.0, min_interval=0.5, max_connections=8):
+        self.provider = provider
+        self.retries, self.backoff, self.max_backoff = retries, backoff, max_backoff
+        self.min_interval = min_interval
+        self._connections = threading.BoundedSemaphore(max_connections)
+        self._last_request = {}
+        self._guard = threading.Lock()
+
+    def _wait_turn(self, ticker):
+        with self._guard:
+            now = time.monotonic()
+            slot = max(now, self._last_request.get(ticker, -np.inf) + self.min_interval)
+            self._last_request[ticker] = slot
+        if slot > now:
+            time.sleep(slot - now)
+
+    def fetch(self, ticker, start, end):
+        for attempt in range(self.retries + 1):
+            self._wait_turn(ticker)
+            try:
+                with self._connections:
+                    return self.provider.fetch(ticker, start, end)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+
+# 제공자 교체 (BACKTEST_DATA_PROVIDER)
+#  - csv:<디렉터리>            로컬 CSV 파일
+#  - synthetic                 합성 GBM 일봉
+#  - simulated[:<실패 확률>]    지연·실패를 흉내 낸 합성 제공자 + 재시도 래퍼
+def provider_from_env():
+    spec = os.environ.get("BACKTEST_DATA_PROVIDER", "")
+    if spec.startswith("csv:"):
+        return CSVProvider(spec[len("csv:"):])
+    if spec == "synthetic":
+        return SyntheticProvider()
+    if spec.split(":")[0] == "simulated":
+        rate = float(spec.partition(":")[2] or 0.2)
+        return RetryingProvider(SimulatedProvider(failure_rate=rate), backoff=0.05, min_interval=0.0)
+    return None
+
+
+# ===== 종목별 영구 저장소 =====
+# <root>/<ticker>/dates.npy (int64 ns), values.npy (float64, 행=일자, 열=OHLCV), meta.json (수집 완료 구간)
+# 조회는 메모리 맵 배열을 searchsorted 로 잘라 복사 없이 DataFrame 으로 감싼다.
+# 저장된 구간 밖의 요청은 부족한 앞/뒤 구간만 제공자에서 받아 병합한다.
+class OHLCVStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, provider=None, max_age=FRESH_SECONDS):
+        self.root = root
+        self.provider = provider or RetryingProvider(YFinanceProvider())
+        self.max_age = max_age
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _dir(self, ticker):
+        return os.path.join(self.root, re.sub(r'[^0-9A-Za-z._-]', '_', ticker))
+
+    def _read_meta(self, ticker):
+        path = os.path.join(self._dir(ticker), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_arrays(self, ticker):
+        directory = self._dir(ticker)
+        dates = np.load(os.path.join(directory, "dates.npy"), mmap_mode='r')
+        values = np.load(os.path.join(directory, "values.npy"), mmap_mode='r')
+        return dates, values
+
+    # 임시 파일에 쓴 뒤 교체 → 다른 프로세스가 읽는 중이어도 깨진 파일을 보지 않음
+    def _write_meta(self, ticker, meta):
+        tmp = os.path.join(self._dir(ticker), "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self._dir(ticker), "meta.json"))
+
+    def _write(self, ticker, df, meta):
+        directory = self._dir(ticker)
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (("dates.npy", df.index.to_numpy(dtype='datetime64[ns]').astype(np.int64)),
+                            ("values.npy", np.ascontiguousarray(df.to_numpy(dtype=np.float64)))):
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, os.path.join(directory, name))
+        self._write_meta(ticker, {**meta, 'columns': list(df.columns)})
+
+    # 저장된 배열 중 [start, end) 구간을 복사 없이 잘라 DataFrame 으로 감싼다
+    def _frame(self, ticker, meta, start=None, end=None):
+        dates, values = self._read_arrays(ticker)
+        lo = 0 if start is None else np.searchsorted(dates, start.value, side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, end.value, side='left')
+        return pd.DataFrame(values[lo:hi], index=pd.DatetimeIndex(dates[lo:hi].view('datetime64[ns]'), name='Date'),
+                            columns=meta['columns'], copy=False)
+
+    # 제공자의 빈 응답은 "그 구간에는 데이터가 없음" 이라는 답으로 기록한다 (다운로드 실패는 예외라 기록되지 않음)
+    #  - 앞쪽: 요청 시작일부터 수집 완료 (상장 전 구간은 빈 응답으로 기록되어 다시 요청하지 않음)
+    #  - 뒤쪽: 마지막으로 받은 봉 다음 날까지, 단 오늘 봉은 장중 값일 수 있으므로 오늘 이전까지만
+    #    (제공자 반영이 늦은 최근 봉은 빈 응답이어도 넓히지 않고, 아래 재요청 간격이 지나면 다시 묻는다)
+    # 뒤쪽 요청은 max_age 초 안에 같은 종료일까지 이미 물어봤다면 다시 보내지 않는다 (last_fetched, fetched_until).
+    # 데이터가 전혀 없는 종목도 빈 배열로 기록해 재실행마다 다시 요청하지 않는다.
+    def load(self, ticker, start, end):
+        start, end = _to_timestamp(start), _to_timestamp(end)
+        now = pd.Timestamp.now()
+        today = now.normalize()
+
+        def covered_until(fetched):
+            return min(fetched.index[-1] + pd.Timedelta(days=1), today)
+
+        def fetched_stamp(meta):
+            until = max(end, pd.Timestamp(meta.get('fetched_until', end)))
+            return {'last_fetched': now.isoformat(timespec='seconds'), 'fetched_until': until.strftime("%Y-%m-%d")}
+
+        with self._lock(ticker):
+            meta = self._read_meta(ticker)
+            if meta is None:
+                fetched = self.provider.fetch(ticker, start, end)
+                covered_end = covered_until(fetched) if not fetched.empty else start
+                self._write(ticker, fetched, {'covered_start': start.strftime("%Y-%m-%d"),
+                                              'covered_end': covered_end.strftime("%Y-%m-%d"), **fetched_stamp({})})
+                return self._frame(ticker, self._read_meta(ticker), start, end)
+
+            covered_start = pd.Timestamp(meta['covered_start'])
+            covered_end = pd.Timestamp(meta['covered_end'])
+            fresh = ('last_fetched' in meta and end <= pd.Timestamp(meta['fetched_until'])
+                     and (now - pd.Timestamp(meta['last_fetched'])).total_seconds() < self.max_age)
+            parts, updated = [], dict(meta)
+            if start < covered_start:
+                fetched = self.provider.fetch(ticker, start, covered_start)
+                updated['covered_start'] = start.strftime("%Y-%m-%d")
+                if not fetched.empty:
+                    parts.append(fetched)
+            if end > covered_end and not fresh:
+                fetched = self.provider.fetch(ticker, covered_end, end)
+                updated.update(fetched_stamp(meta))
+                if not fetched.empty:
+                    parts.append(fetched)
+                    updated['covered_end'] = max(covered_end, covered_until(fetched)).strftime("%Y-%m-%d")
+            if parts:
+                merged = pd.concat([self._frame(ticker, meta)] + parts)
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                self._write(ticker, merged, updated)
+            elif updated != meta:
+                # 새 행이 없으면 배열은 그대로 두고 마지막 요청 시각만 기록
+                self._write_meta(ticker, updated)
+            return self._frame(ticker, self._read_meta(ticker), start, end)
+
+    # 여러 종목을 스레드 풀에서 동시에 불러와 저장소를 채운다 (이후 load 는 디스크에서 바로 읽음)
+    # 반환: ({티커: DataFrame} 입력 순서, 데이터 있는 종목만), {티커: 오류 메시지}
+    def load_many(self, tickers, start, end, workers=8):
+        tickers = list(dict.fromkeys(tickers))
+        frames, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tickers) or 1))) as pool:
+            futures = {ticker: pool.submit(self.load, ticker, start, end) for ticker in tickers}
+        for ticker, future in futures.items():
+            try:
+                df = future.result()
+            except Exception as e:
+                errors[ticker] = str(e)
+                continue
+            if df.empty:
+                errors[ticker] = "데이터 없음"
+            else:
+                frames[ticker] = df
+        return frames, errors
+
+    def invalidate(self, ticker):
+        directory = self._dir(ticker)
+        with self._lock(ticker):
+            for name in ("meta.json", "dates.npy", "values.npy"):
+                path = os.path.join(directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+# 종목별 DataFrame 의 한 컬럼을 날짜 합집합(how='outer') 또는 교집합(how='inner') 기준으로 맞춘 패널 (행=일자, 열=티커)
+def to_panel(frames, column='Close', how='outer'):
+    if not frames:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'), dtype=np.float64)
+    return pd.concat({ticker: df[column] for ticker, df in frames.items()}, axis=1, join=how).sort_index()
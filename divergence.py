@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from panel_matrix import as_matrix, valid_span, ffill, panel_rsi
+
+BULLISH, BEARISH = 1, -1
+KIND_NAMES = {BULLISH: "bullish", BEARISH: "bearish"}
+
+
+# ===== 극값 탐지 =====
+# scipy.signal.argrelextrema(mode='clip') 와 같은 규칙의 NumPy 구현 (마지막 축이 시간 축)
+# 좌우 order 개 이웃 모두와 비교하며, 범위 밖 이웃은 끝 값으로 잘린다(clip) → 끝 값과의 비교는 이미 더 짧은 거리에서
+# 이루어지므로 겹치는 구간만 비교하면 된다. NaN 은 어떤 비교도 참이 아니므로 극값이 되지 않는다.
+def extrema_mask(y, order, comparator):
+    if int(order) < 1:
+        raise ValueError("extrema_order 는 1 이상이어야 합니다.")
+    y = np.asarray(y, dtype=np.float64)
+    mask = ~np.isnan(y)
+    for shift in range(1, min(int(order), y.shape[-1] - 1) + 1):
+        mask[..., :-shift] &= comparator(y[..., :-shift], y[..., shift:])
+        mask[..., shift:] &= comparator(y[..., shift:], y[..., :-shift])
+    return mask
+
+
+# (극대 위치, 극소 위치): 1차원이면 정수 배열, 2차원이면 (행, 열) 튜플 (np.nonzero 와 같은 행 우선 순서)
+def local_extrema(y, order):
+    maxima = np.nonzero(extrema_mask(y, order, np.greater_equal))
+    minima = np.nonzero(extrema_mask(y, order, np.less_equal))
+    if np.ndim(y) == 1:
+        return maxima[0], minima[0]
+    return maxima, minima
+
+
+# ===== 다이버전스 =====
+# 연속된 극값 쌍 (p1, p2) 중 가격과 RSI 가 엇갈리는 쌍 (임계값 비교 전 후보)
+#  - bullish: 극소 쌍에서 가격은 낮아지고 RSI 는 높아짐
+#  - bearish: 극대 쌍에서 가격은 높아지고 RSI 는 낮아짐
+def divergence_candidates(y, rsi, extrema, kind):
+    extrema = np.asarray(extrema, dtype=np.int64)
+    p1, p2 = extrema[:-1], extrema[1:]
+    with np.errstate(invalid='ignore'):
+        if kind == "bullish":
+            mask = (y[p2] < y[p1]) & (rsi[p2] > rsi[p1])
+        else:
+            mask = (y[p2] > y[p1]) & (rsi[p2] < rsi[p1])
+    return p1[mask], p2[mask]
+
+
+# 임계값까지 적용한 다이버전스 위치: (p1, p2, kind) 정수 배열 — 강세 전체 다음에 약세 (find_divergences 와 같은 순서)
+def find_divergence_positions(y, rsi, local_min, local_max, rsi_oversold, rsi_overbought):
+    bull_p1, bull_p2 = divergence_candidates(y, rsi, local_min, "bullish")
+    keep = rsi[bull_p2] <= rsi_oversold
+    bull_p1, bull_p2 = bull_p1[keep], bull_p2[keep]
+    bear_p1, bear_p2 = divergence_candidates(y, rsi, local_max, "bearish")
+    keep = rsi[bear_p2] >= rsi_overbought
+    bear_p1, bear_p2 = bear_p1[keep], bear_p2[keep]
+    kind = np.concatenate([np.full(len(bull_p2), BULLISH, dtype=np.int8), np.full(len(bear_p2), BEARISH, dtype=np.int8)])
+    return np.concatenate([bull_p1, bear_p1]), np.concatenate([bull_p2, bear_p2]), kind
+
+
+# 2차원(종목 × 일자) 버전: 극값 쌍은 같은 행 안에서만 만든다. (행, p1, p2, kind) 반환
+def find_panel_divergences(y, rsi, order, rsi_oversold, rsi_overbought):
+    maxima, minima = local_extrema(y, order)
+    parts = []
+    for (rows, cols), kind, threshold in ((minima, "bullish", rsi_oversold), (maxima, "bearish", rsi_overbought)):
+        same = rows[1:] == rows[:-1]
+        r, p1, p2 = rows[1:][same], cols[:-1][same], cols[1:][same]
+        with np.errstate(invalid='ignore'):
+            if kind == "bullish":
+                mask = (y[r, p2] < y[r, p1]) & (rsi[r, p2] > rsi[r, p1]) & (rsi[r, p2] <= threshold)
+            else:
+                mask = (y[r, p2] > y[r, p1]) & (rsi[r, p2] < rsi[r, p1]) & (rsi[r, p2] >= threshold)
+        code = BULLISH if kind == "bullish" else BEARISH
+        parts.append((r[mask], p1[mask], p2[mask], np.full(int(mask.sum()), code, dtype=np.int8)))
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+# 다이버전스 p2 시점의 신호를 덮어씀: 강세(+1)를 먼저, 약세(-1)를 나중에 (같은 봉이면 약세가 남음)
+# rows 가 주어지면 2차원 신호 행렬의 (행, p2) 에 적용
+def apply_divergences(signal, p2, kind, rows=None):
+    for code in (BULLISH, BEARISH):
+        selected = kind == code
+        if rows is None:
+            signal[p2[selected]] = code
+        else:
+            signal[rows[selected], p2[selected]] = code
+    return signal
+
+
+# 위치 배열 → (p1 날짜, p2 날짜, 'bullish'/'bearish') 목록 (차트·화면 표시용)
+def to_date_tuples(index, p1, p2, kind):
+    return [(index[a], index[b], KIND_NAMES[k]) for a, b, k in zip(p1.tolist(), p2.tolist(), kind.tolist())]
+
+
+# ===== 유니버스 스캔 (스크리닝) =====
+# prices: 일자 × 종목 종가 (data_store.to_panel 결과 등). 전 종목 RSI·극값·다이버전스를 한 번에 계산하고
+# 종목별 마지막 유효 봉 기준 lookback 봉 안에 p2 가 있는 다이버전스만 돌려준다 (None 이면 전체).
+# 마지막 extrema_order 개 봉의 극값은 이후 데이터가 들어오면 바뀔 수 있는 잠정 값이다.
+def scan_universe(prices, params, lookback=None, block_size=64):
+    matrix, dates, tickers = as_matrix(prices, np.float64)
+    first, last = valid_span(matrix)
+    columns = ['ticker', 'kind', 'date_p1', 'date_p2', 'close_p1', 'close_p2', 'rsi_p1', 'rsi_p2', 'bars_ago']
+    found = []
+    for lo in range(0, len(tickers), block_size):
+        hi = min(lo + block_size, len(tickers))
+        block = ffill(matrix[lo:hi])
+        rsi = panel_rsi(block, first[lo:hi], int(params['rsi_period']))
+        filled = pd.DataFrame(block.T).bfill().to_numpy().T
+        rows, p1, p2, kind = find_panel_divergences(filled, rsi, int(params['extrema_order']),
+                                                    params['rsi_oversold'], params['rsi_overbought'])
+        bars_ago = last[lo:hi][rows] - p2
+        keep = (p2 <= last[lo:hi][rows]) if lookback is None else (bars_ago >= 0) & (bars_ago < lookback)
+        rows, p1, p2, kind, bars_ago = rows[keep], p1[keep], p2[keep], kind[keep], bars_ago[keep]
+        found.append(pd.DataFrame({
+            'ticker': [tickers[lo + r] for r in rows.tolist()],
+            'kind': [KIND_NAMES[k] for k in kind.tolist()],
+            'date_p1': dates[p1], 'date_p2': dates[p2],
+            'close_p1': block[rows, p1], 'close_p2': block[rows, p2],
+            'rsi_p1': rsi[rows, p1], 'rsi_p2': rsi[rows, p2],
+            'bars_ago': bars_ago,
+        }, columns=columns))
+    if not found:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(found, ignore_index=True).sort_values(['bars_ago', 'ticker'], kind='stable', ignore_index=True)
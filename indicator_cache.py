@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# 가격 시계열 지문: 값(float64 바이트) 기준 해시 → 같은 데이터면 다른 DataFrame 객체여도 동일
+def series_fingerprint(values):
+    arr = np.ascontiguousarray(np.asarray(values, dtype=np.float64).ravel())
+    digest = hashlib.blake2b(arr.tobytes(), digest_size=16)
+    digest.update(str(arr.shape).encode())
+    return digest.hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+# 지표 캐시: (가격 지문, 단계, 파라미터...) → 계산 결과
+# 항목 수(maxsize)와 메모리(max_bytes) 한도를 넘으면 가장 오래 사용하지 않은 항목부터 제거(LRU)
+class IndicatorCache:
+    def __init__(self, maxsize=256, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        value = compute()
+        _freeze(value)
+
+        with self._lock:
+            if key not in self._data:
+                size = _nbytes(value)
+                self._data[key] = value
+                self._sizes[key] = size
+                self._bytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self._data and (
+            (self.maxsize is not None and len(self._data) > self.maxsize)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1)
+        ):
+            key, _ = self._data.popitem(last=False)
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'nbytes': self._bytes,
+        }
+
+
+# 캐시된 배열을 여러 백테스트가 공유하므로 읽기 전용으로 고정
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
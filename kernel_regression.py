@@ -0,0 +1,65 @@
+import numpy as np
+
+KR_METHODS = ("numpy", "statsmodels")
+
+
+# 가우시안 커널 국소 선형(local linear) 회귀 가중치
+# x축이 등간격이고 대역폭이 고정이므로 모든 윈도우에서 가중치 벡터가 동일하다.
+# statsmodels KernelReg(var_type='c', reg_type='ll') 의 계산식을 그대로 따른다.
+def local_linear_weights(window, bandwidth):
+    offsets = np.arange(-window, 0, dtype=float)  # x_train - x_predict
+    ker = (1.0 / np.sqrt(2 * np.pi)) * np.exp(-(offsets ** 2) / (bandwidth ** 2 * 2.0))
+    ker = ker / bandwidth / float(window)
+
+    m12 = (offsets * ker).sum()
+    M = np.array([[ker.sum(), m12],
+                  [m12, (offsets * offsets * ker).sum()]])
+    row = np.linalg.pinv(M)[0]
+    return ker * (row[0] + row[1] * offsets)
+
+
+# 각 시점 i 에 대해 직전 window 개 데이터로 학습한 커널 회귀의 x[i] 예측값을 한 번에 계산
+# profiler 가 주어지면 예측 개수(kernel_fits)와 실패로 NaN 처리된 개수(kernel_errors)를 기록
+def kernel_regression(y, window, bandwidth, method="numpy", profiler=None):
+    y = np.asarray(y, dtype=float).ravel()
+    window = int(window)
+    y_pred = np.full(len(y), np.nan)
+    if window < 1 or window >= len(y):
+        return y_pred
+
+    if profiler is not None:
+        profiler.count('kernel_fits', len(y) - window)
+    if method == "statsmodels":
+        return _kernel_regression_statsmodels(y, window, bandwidth, profiler)
+    if method != "numpy":
+        raise ValueError(f"지원하지 않는 커널 회귀 방식입니다: {method} (가능: {KR_METHODS})")
+
+    try:
+        weights = local_linear_weights(window, bandwidth)
+    except np.linalg.LinAlgError:
+        if profiler is not None:
+            profiler.count('kernel_errors', len(y) - window)
+        return y_pred
+
+    # 'valid' 컨볼루션의 k 번째 값 = y[k:k+window] 과 weights 의 내적 → 예측 시점은 k+window
+    y_pred[window:] = np.convolve(y, weights[::-1], mode="valid")[:-1]
+    return y_pred
+
+
+# 기준(검증)용: 시점마다 statsmodels KernelReg 를 새로 학습하는 기존 방식
+def _kernel_regression_statsmodels(y, window, bandwidth, profiler=None):
+    from statsmodels.nonparametric.kernel_regression import KernelReg
+
+    x = np.arange(len(y))
+    y_pred = np.full(len(y), np.nan)
+    for i in range(window, len(y)):
+        x_train = x[i - window:i]
+        y_train = y[i - window:i]
+        try:
+            kr = KernelReg(endog=y_train, exog=x_train, var_type='c', bw=[bandwidth])
+            y_pred[i] = kr.fit([x[i]])[0][0]
+        except Exception:
+            y_pred[i] = np.nan
+            if profiler is not None:
+                profiler.count('kernel_errors')
+    return y_pred
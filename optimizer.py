@@ -0,0 +1,411 @@
+import os
+import math
+import time
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from backtest_core import run_backtest_metrics
+from indicator_cache import IndicatorCache
+
+
+# Optuna 탐색 공간: 이름 → (종류, 최솟값, 최댓값)
+# UI 목적 함수, 병렬 워커, 저장된 스터디의 키(study_store)가 공유한다.
+SEARCH_SPACE = {
+    'kr_window': ('int', 20, 100),
+    'kr_bandwidth': ('float', 0.5, 10.0),
+    'bb_k': ('float', 0.1, 2.0),
+    'rsi_period': ('int', 7, 21),
+    'extrema_order': ('int', 3, 10),
+    'rsi_oversold': ('int', 20, 40),
+    'rsi_overbought': ('int', 60, 80),
+}
+
+
+def suggest_params(trial):
+    return {name: (trial.suggest_int if kind == 'int' else trial.suggest_float)(name, low, high)
+            for name, (kind, low, high) in SEARCH_SPACE.items()}
+
+
+# ===== 완료된 시도 결과 재사용 =====
+# 파라미터 세트가 완전히 같은 시도는 다시 백테스트하지 않고 이전 결과(값 + user_attrs)를 그대로 기록한다.
+def params_key(params):
+    return tuple(sorted(params.items()))
+
+
+def completed_results(study):
+    import optuna
+
+    return {params_key(t.params): (t.value, t.user_attrs)
+            for t in study.get_trials(states=(optuna.trial.TrialState.COMPLETE,))}
+
+
+# 이전 결과의 user_attrs 를 새 시도에 복사하고 값을 돌려줌
+def _restore(trial, result):
+    value, user_attrs = result
+    for name, attr in user_attrs.items():
+        trial.set_user_attr(name, attr)
+    trial.set_user_attr('cached', True)
+    return value
+
+
+# 직렬 실행용 목적 함수 래퍼 (study.optimize 에 전달)
+def cached_objective(study, objective):
+    known = completed_results(study)
+
+    def wrapped(trial):
+        key = params_key(suggest_params(trial))
+        if key in known:
+            return _restore(trial, known[key])
+        value = objective(trial)
+        known[key] = (value, dict(trial.user_attrs))
+        return value
+
+    return wrapped
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+# ===== 워크포워드 목적 함수 =====
+# 전체 기간을 시간 순서대로 n_folds 개 폴드로 나눠 폴드마다 따로 백테스트한다.
+# 폴드가 끝날 때마다 지금까지의 폴드 평균 수익률을 trial.report 로 보고해 가지치기(pruner)가 가망 없는 시도를 중단한다.
+# 마지막 holdout 비율 구간은 목적 함수에 쓰지 않고, 끝까지 진행한 시도의 표본 외(out-of-sample) 수익률로만 기록한다.
+OBJECTIVES = ("full", "walk_forward")
+# 폴드 앞에 붙이는 지표 준비 구간 (탐색 공간의 최대 kr_window 이상, 고정값이라 폴드별 지표 캐시가 시도 간에 재사용됨)
+WALK_FORWARD_WARMUP = 120
+# 폴드 하나의 최소 매매 구간 (탐색 공간의 가장 긴 지표 기간) — 이보다 짧으면 폴드 수를 줄이고, 폴드 2개도 안 되면 오류
+WALK_FORWARD_MIN_FOLD = max(SEARCH_SPACE['kr_window'][2], SEARCH_SPACE['rsi_period'][2])
+WALK_FORWARD_MIN_FOLDS = 2
+
+
+def make_pruner(name="median"):
+    import optuna
+
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5)
+    if name == "successive_halving":
+        return optuna.pruners.SuccessiveHalvingPruner()
+    return optuna.pruners.NopPruner()
+
+
+# (지표 준비 시작, 매매 시작, 끝) 위치 목록과 표본 외 구간을 반환
+# 폴드가 min_fold 봉보다 짧아지면 폴드 수를 줄인다 (반환된 폴드 수가 n_folds 보다 적을 수 있음).
+def walk_forward_folds(n_bars, n_folds=5, holdout=0.2, warmup=WALK_FORWARD_WARMUP, min_fold=WALK_FORWARD_MIN_FOLD):
+    holdout_start = int(n_bars * (1 - holdout)) if holdout > 0 else n_bars
+    n_folds = min(n_folds, max(0, holdout_start - warmup) // min_fold)
+    if n_folds < WALK_FORWARD_MIN_FOLDS:
+        needed = int(np.ceil((warmup + WALK_FORWARD_MIN_FOLDS * min_fold) / (1 - holdout)))
+        raise ValueError(f"데이터가 너무 짧아 워크포워드 폴드를 만들 수 없습니다. ({n_bars}봉, "
+                         f"준비 구간 {warmup}봉 + 폴드 {WALK_FORWARD_MIN_FOLDS}개 × 최소 {min_fold}봉 + 표본 외 구간 → "
+                         f"약 {needed}봉 이상 필요)")
+    edges = np.linspace(warmup, holdout_start, n_folds + 1).astype(int)
+    folds = [(max(0, lo - warmup), lo, hi) for lo, hi in zip(edges[:-1], edges[1:])]
+    oos = (max(0, holdout_start - warmup), holdout_start, n_bars) if holdout_start < n_bars else None
+    return folds, oos
+
+
+def evaluate_fold(close, params, fold, initial_balance, fee, cache=None, profiler=None):
+    data_start, trade_start, end = fold
+    warmup = max(int(params['kr_window']), 20, int(params['rsi_period']))
+    if trade_start - data_start < warmup:
+        # 준비 구간이 부족한 파라미터는 폴드 앞부분을 준비 구간으로 더 사용
+        trade_start = min(end - 1, data_start + warmup)
+    metrics = run_backtest_metrics(close[data_start:end], params, initial_balance, fee, cache=cache,
+                                   profiler=profiler, trade_start=trade_start - data_start)
+    return metrics.profit_pct
+
+
+# 직렬 실행용 워크포워드 목적 함수 (study.optimize 에 그대로 전달)
+def walk_forward_objective(close, initial_balance, fee, n_folds=5, holdout=0.2, cache=None, profiler=None):
+    import optuna
+
+    close = np.asarray(close, dtype=np.float64).ravel()
+    folds, oos = walk_forward_folds(len(close), n_folds, holdout)
+
+    def objective(trial):
+        params = suggest_params(trial)
+        profits = []
+        for step, fold in enumerate(folds):
+            profits.append(evaluate_fold(close, params, fold, initial_balance, fee, cache, profiler))
+            trial.report(float(np.mean(profits)), step)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        trial.set_user_attr('fold_profits', profits)
+        if oos is not None:
+            trial.set_user_attr('oos_profit_pct', evaluate_fold(close, params, oos, initial_balance, fee, cache))
+        return float(np.mean(profits))
+
+    return objective
+
+
+# ===== 다중 충실도(multi-fidelity) 최적화 =====
+# 저충실도 데이터(주봉 또는 최근 구간)에서 넓게 탐색한 뒤 상위 설정만 전체 해상도(일봉 전체 기간)로 다시 평가한다.
+# 파라미터는 항상 일봉 단위로 제안·기록하고, 주봉 평가 때만 봉 길이 배율로 나눠 환산한다.
+# (변동성 창 20 봉은 엔진 고정값이라 주봉에서는 약 100 거래일에 해당 → 순위 상관으로 충실도를 확인)
+FIDELITIES = ("weekly", "recent")
+# 봉 수 단위 파라미터의 환산 하한 (커널 가중치·극값 탐지가 퇴화하지 않는 최소값)
+SCALED_MINIMUMS = {'kr_window': 5, 'kr_bandwidth': 0.5, 'rsi_period': 2, 'extrema_order': 1}
+
+
+# 저충실도 종가와 봉 길이 배율 (일봉 몇 개가 저충실도 봉 하나인지)
+def low_fidelity_close(df, fidelity="weekly", recent_fraction=0.25):
+    close = df['Close']
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    if fidelity == "weekly":
+        weekly = close.resample('W-FRI').last().dropna() if isinstance(close.index, pd.DatetimeIndex) else close.iloc[4::5]
+        return weekly.to_numpy(dtype=np.float64), len(close) / max(len(weekly), 1)
+    if fidelity == "recent":
+        start = int(len(close) * (1 - recent_fraction))
+        return close.to_numpy(dtype=np.float64)[start:], 1.0
+    raise ValueError(f"지원하지 않는 저충실도 방식입니다: {fidelity} (가능: {FIDELITIES})")
+
+
+# 일봉 단위 파라미터 → 봉 길이 배율(ratio)로 나눈 저충실도 파라미터 (RSI·밴드 임계값은 그대로)
+def scale_params(params, ratio):
+    if ratio == 1:
+        return dict(params)
+    scaled = dict(params)
+    for name, minimum in SCALED_MINIMUMS.items():
+        value = params[name] / ratio
+        scaled[name] = max(minimum, int(round(value)) if isinstance(params[name], int) else value)
+    return scaled
+
+
+# 스피어만 순위 상관 (동점은 평균 순위), 값이 3개 미만이거나 한쪽이 모두 같으면 NaN
+def spearman(a, b):
+    ranks_a = pd.Series(a, dtype=np.float64).rank().to_numpy()
+    ranks_b = pd.Series(b, dtype=np.float64).rank().to_numpy()
+    if len(ranks_a) < 3 or ranks_a.std() == 0 or ranks_b.std() == 0:
+        return float('nan')
+    return float(np.corrcoef(ranks_a, ranks_b)[0, 1])
+
+
+# 다중 충실도 최적화
+# 1) 저충실도 데이터로 n_trials 회 탐색 (별도 메모리 스터디)
+# 2) 저충실도 상위 top_fraction 설정 + 순위 비교용 무작위 n_audit 설정을 전체 해상도로 평가해 study 에 기록
+#    (study 에 같은 파라미터 결과가 있으면 재사용, user_attrs 에 저충실도 값·승격 여부 기록)
+# 3) 전체 해상도로 평가한 설정들의 저충실도/전체 순위 스피어만 상관을 보고
+# callback(완료 수, 전체 수, 단계) — 단계는 "low" / "full"
+# n_workers > 1 이면 전체 해상도 단계를 optimize_parallel 로 나눠 평가한다 (큐에 넣은 후보를 순서대로 꺼내 감).
+def optimize_multi_fidelity(df, n_trials, initial_balance, fee, study=None, fidelity="weekly", top_fraction=0.1,
+                            recent_fraction=0.25, n_audit=10, seed=None, callback=None, cache=None, n_workers=1):
+    import optuna
+
+    close = df['Close'].to_numpy(dtype=np.float64).ravel()
+    low_close, ratio = low_fidelity_close(df, fidelity, recent_fraction)
+    low_cache = IndicatorCache(maxsize=256)
+    low_study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed))
+
+    def low_objective(trial):
+        params = scale_params(suggest_params(trial), ratio)
+        return run_backtest_metrics(low_close, params, initial_balance, fee, cache=low_cache).profit_pct
+
+    started = time.perf_counter()
+    objective = cached_objective(low_study, low_objective)
+    for i in range(n_trials):
+        low_study.optimize(objective, n_trials=1)
+        if callback is not None:
+            callback(i + 1, n_trials, "low")
+    low_seconds = time.perf_counter() - started
+
+    ranked = {}
+    for trial in sorted(low_study.get_trials(states=(optuna.trial.TrialState.COMPLETE,)),
+                        key=lambda t: t.value, reverse=True):
+        ranked.setdefault(params_key(trial.params), (trial.params, trial.value))
+    ranked = list(ranked.values())
+    top_k = max(1, math.ceil(top_fraction * len(ranked)))
+    rest = ranked[top_k:]
+    rng = np.random.default_rng(seed)
+    audit = [rest[i] for i in sorted(rng.choice(len(rest), size=min(n_audit, len(rest)), replace=False))]
+
+    if study is None:
+        study = optuna.create_study(direction="maximize")
+    previous = len(study.trials)
+    candidates = [(params, value, True) for params, value in ranked[:top_k]] + \
+                 [(params, value, False) for params, value in audit]
+    for params, value, promoted in candidates:
+        study.enqueue_trial(params, user_attrs={'low_fidelity_value': value, 'promoted': promoted})
+
+    def full_objective(trial):
+        return run_backtest_metrics(close, suggest_params(trial), initial_balance, fee, cache=cache).profit_pct
+
+    started = time.perf_counter()
+    if n_workers > 1:
+        optimize_parallel(df, len(candidates), initial_balance, fee, n_workers=n_workers, study=study,
+                          callback=None if callback is None else lambda done, total, _: callback(done, total, "full"))
+    else:
+        objective = cached_objective(study, full_objective)
+        for i in range(len(candidates)):
+            study.optimize(objective, n_trials=1)
+            if callback is not None:
+                callback(i + 1, len(candidates), "full")
+    full_seconds = time.perf_counter() - started
+
+    # 재사용된 시도는 이전 user_attrs 로 덮이므로 후보 목록 순서(큐 순서)대로 값을 맞춘다
+    evaluated = pd.DataFrame([{**params, 'low_fidelity_value': value, 'full_value': trial.value, 'promoted': promoted}
+                              for (params, value, promoted), trial in zip(candidates, study.trials[previous:])
+                              if trial.state.name == "COMPLETE"])
+    return {
+        'study': study,
+        'low_study': low_study,
+        'evaluated': evaluated,
+        'spearman': spearman(evaluated['low_fidelity_value'], evaluated['full_value']) if len(evaluated) else float('nan'),
+        'spearman_promoted': spearman(*evaluated.loc[evaluated['promoted'], ['low_fidelity_value', 'full_value']]
+                                      .to_numpy().T) if len(evaluated) else float('nan'),
+        'top_k': top_k,
+        'ratio': ratio,
+        'low_bars': len(low_close),
+        'low_seconds': low_seconds,
+        'full_seconds': full_seconds,
+    }
+
+
+# ===== 워커 간 공유되는 종가 배열 =====
+# 종가를 메모리 맵(.npy) 파일로 한 번만 기록하고, 각 워커는 읽기 전용으로 매핑만 한다.
+# (워커마다 DataFrame 을 pickle 로 복사해 보내지 않음, 페이지 캐시를 모든 프로세스가 공유)
+class SharedCloseArray:
+    def __init__(self, close):
+        close = np.ascontiguousarray(np.asarray(close, dtype=np.float64).ravel())
+        base_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        self._dir = tempfile.mkdtemp(prefix="backtest_close_", dir=base_dir)
+        self.path = os.path.join(self._dir, "close.npy")
+        np.save(self.path, close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+_worker = {}
+
+
+def _init_worker(close_path, initial_balance, fee):
+    _worker['close'] = np.load(close_path, mmap_mode='r')
+    _worker['initial_balance'] = initial_balance
+    _worker['fee'] = fee
+    _worker['cache'] = IndicatorCache(maxsize=128)
+
+
+def _evaluate(params):
+    metrics = run_backtest_metrics(_worker['close'], params, _worker['initial_balance'],
+                                   _worker['fee'], cache=_worker['cache'])
+    return metrics.profit_pct
+
+
+def _evaluate_fold(params, fold):
+    return evaluate_fold(_worker['close'], params, fold, _worker['initial_balance'], _worker['fee'],
+                         cache=_worker['cache'])
+
+
+# 프로세스 풀 병렬 최적화 (ask/tell 방식)
+# 메인 프로세스가 파라미터를 샘플링하고, 완료된 시도마다 callback(완료 수, 전체 수, study) 호출
+# objective="walk_forward" 이면 폴드 하나를 작업 하나로 제출하고, 폴드 결과가 올 때마다 메인 프로세스에서
+# trial.report / should_prune 으로 다음 폴드를 이어서 제출할지 결정한다.
+def optimize_parallel(df, n_trials, initial_balance, fee, n_workers=None, study=None, callback=None,
+                      objective="full", n_folds=5, holdout=0.2, pruner="median"):
+    import optuna  # 워커 프로세스는 optuna 가 필요 없으므로 메인 프로세스에서만 불러옴
+
+    n_workers = n_workers or default_workers()
+    if study is None:
+        # 동시에 진행 중인 시도끼리 같은 지점을 중복 탐색하지 않도록 constant_liar 사용
+        study = optuna.create_study(direction="maximize",
+                                    sampler=optuna.samplers.TPESampler(constant_liar=True),
+                                    pruner=make_pruner(pruner) if objective == "walk_forward" else None)
+
+    close = df['Close'].to_numpy().ravel()
+    known = completed_results(study)
+    folds, oos = walk_forward_folds(len(close), n_folds, holdout) if objective == "walk_forward" else ([], None)
+    ctx = multiprocessing.get_context("spawn")
+    completed = 0
+    submitted = 0
+
+    with SharedCloseArray(close) as shared, ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(shared.path, initial_balance, fee)) as pool:
+        pending = {}
+        fold_profits = {}
+
+        def submit_step(trial, params, step):
+            if objective == "full":
+                future = pool.submit(_evaluate, params)
+            else:
+                future = pool.submit(_evaluate_fold, params, folds[step] if step < len(folds) else oos)
+            pending[future] = (trial, params, step)
+
+        def done_one():
+            nonlocal completed
+            completed += 1
+            if callback is not None:
+                callback(completed, n_trials, study)
+
+        # 새 시도를 하나 제출 (이미 평가한 파라미터 세트면 바로 기록하고 다음 시도를 샘플링)
+        def submit():
+            nonlocal submitted
+            while submitted < n_trials:
+                trial = study.ask()
+                params = suggest_params(trial)
+                submitted += 1
+                result = known.get(params_key(params))
+                if result is None:
+                    fold_profits[trial.number] = []
+                    submit_step(trial, params, 0)
+                    return
+                study.tell(trial, _restore(trial, result))
+                done_one()
+
+        def finish(trial, params, values=None, state=None):
+            if state is None:
+                study.tell(trial, values)
+                known[params_key(params)] = (values, dict(trial.user_attrs))
+            else:
+                study.tell(trial, state=state)
+            fold_profits.pop(trial.number, None)
+            done_one()
+            if submitted < n_trials:
+                submit()
+
+        while submitted < n_trials and len(pending) < n_workers:
+            submit()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, params, step = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception:
+                    finish(trial, params, state=optuna.trial.TrialState.FAIL)
+                    continue
+                if objective == "full":
+                    finish(trial, params, values=value)
+                    continue
+
+                profits = fold_profits[trial.number]
+                if step < len(folds):
+                    profits.append(value)
+                    trial.report(float(np.mean(profits)), step)
+                    if trial.should_prune():
+                        finish(trial, params, state=optuna.trial.TrialState.PRUNED)
+                    elif step + 1 < len(folds) or oos is not None:
+                        submit_step(trial, params, step + 1)
+                    else:
+                        trial.set_user_attr('fold_profits', profits)
+                        finish(trial, params, values=float(np.mean(profits)))
+                else:
+                    trial.set_user_attr('fold_profits', profits)
+                    trial.set_user_attr('oos_profit_pct', value)
+                    finish(trial, params, values=float(np.mean(profits)))
+
+    return study
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from backtest_core import band_signals, filter_signals
+from kernel_regression import local_linear_weights
+from divergence import find_panel_divergences, apply_divergences
+from panel_matrix import as_matrix, valid_span, ffill, panel_rsi
+
+VOL_WINDOW = 20
+
+
+# ===== 다종목 패널 백테스트 =====
+# 공통 날짜 축에 맞춘 가격 행렬(일자 × 종목)로 전 종목 지표·신호를 한 번에 계산하고,
+# 하나의 자본 계좌를 종목별 목표 비중으로 나눠 쓰는 포트폴리오를 시뮬레이션한다.
+#  - 내부 배열은 (종목 × 일자) C-연속 배열 → 종목별 시계열이 메모리에 연속으로 놓인다.
+#  - 지표는 block_size 종목씩 계산하고, 전체 패널에는 가격과 int8 신호만 유지한다.
+#  - 종목의 첫 유효 봉 이전/마지막 유효 봉 이후에는 신호를 내지 않고, 중간 결측(휴장)은 직전 종가로 채운다.
+# 달력이 같은 종목 하나만 넣으면 run_backtest_metrics 와 (커널 회귀 부동소수점 반올림 범위 안에서) 같은 결과를 낸다.
+
+
+# 종목마다 같은 가중치 벡터이므로 슬라이딩 창 × 가중치 한 번으로 전 종목 예측 (NaN 이 섞인 창은 NaN)
+def _panel_kernel_regression(block, window, bandwidth):
+    y_pred = np.full(block.shape, np.nan, dtype=block.dtype)
+    if window < 1 or window >= block.shape[1]:
+        return y_pred
+    try:
+        weights = local_linear_weights(window, bandwidth).astype(block.dtype)
+    except np.linalg.LinAlgError:
+        return y_pred
+    windows = np.lib.stride_tricks.sliding_window_view(block, window, axis=1)
+    y_pred[:, window:] = (windows @ weights)[:, :-1]
+    return y_pred
+
+
+# 전 종목 필터링된 신호 행렬 (종목 × 일자, int8)
+# 유효 봉 수가 kr_window 이하인 종목과 유효 구간 밖, 마지막 유효 봉(다음 봉 체결 불가)의 신호는 0
+def panel_signals(prices, params, dtype=np.float64, block_size=64):
+    matrix, _, _ = as_matrix(prices, dtype)
+    first, last = valid_span(matrix)
+    n_assets, n_bars = matrix.shape
+    window, period = int(params['kr_window']), int(params['rsi_period'])
+    signals = np.zeros((n_assets, n_bars), dtype=np.int8)
+    t = np.arange(n_bars)
+
+    for lo in range(0, n_assets, block_size):
+        hi = min(lo + block_size, n_assets)
+        block = ffill(matrix[lo:hi])
+        rsi = panel_rsi(block, first[lo:hi], period)
+        vol = pd.DataFrame(block.T).rolling(VOL_WINDOW).std().to_numpy().T
+        y_pred = _panel_kernel_regression(block, window, params['kr_bandwidth'])
+        signal = band_signals(block, y_pred, params['bb_k'] * vol)
+        # 극값은 결측을 앞/뒤 값으로 채운 가격에서 찾는다 (상장 전·상폐 후 평탄 구간은 RSI 가 NaN 이라 다이버전스가 되지 않음)
+        filled = pd.DataFrame(block.T).bfill().to_numpy().T
+        rows, _, p2, kind = find_panel_divergences(filled, rsi, int(params['extrema_order']),
+                                                   params['rsi_oversold'], params['rsi_overbought'])
+        apply_divergences(signal, p2, kind, rows=rows)
+
+        active = (t[None, :] >= first[lo:hi, None]) & (t[None, :] < last[lo:hi, None])
+        active &= (last[lo:hi] - first[lo:hi] + 1 > window)[:, None]
+        signals[lo:hi] = filter_signals(np.where(active, signal, 0.0))
+    return signals
+
+
+class PanelResult:
+    __slots__ = ('dates', 'tickers', 'equity', 'cash', 'profit_pct', 'final_value', 'max_drawdown',
+                 'trade_count', 'asset_pnl')
+
+    def __init__(self, dates, tickers, equity, cash, initial_balance, trade_count, asset_pnl):
+        self.dates = dates
+        self.tickers = tickers
+        self.equity = equity
+        self.cash = cash
+        self.final_value = float(equity[-1]) if len(equity) else float(initial_balance)
+        self.profit_pct = (self.final_value - initial_balance) / initial_balance * 100
+        peak = np.fmax.accumulate(equity) if len(equity) else equity
+        drawdown = np.where(peak > 0, (peak - equity) / peak, 0.0)
+        self.max_drawdown = float(np.nanmax(drawdown)) * 100 if len(equity) else 0.0
+        self.trade_count = trade_count
+        self.asset_pnl = asset_pnl
+
+    def __repr__(self):
+        return (f"PanelResult(assets={len(self.tickers)}, profit_pct={self.profit_pct:.4f}, "
+                f"final_value={self.final_value:.4f}, max_drawdown={self.max_drawdown:.4f})")
+
+    def equity_curve(self):
+        return pd.Series(self.equity, index=self.dates, name='equity')
+
+    # 종목별 거래 수와 실현 손익 (수수료 포함)
+    def summary(self):
+        return pd.DataFrame({'trade_count': self.trade_count, 'pnl': self.asset_pnl}, index=self.tickers)
+
+
+# 공유 자본 포트폴리오 시뮬레이션
+# i 시점 신호는 i+1 종가에 체결 (run_backtest 와 동일). 같은 봉에서는 매도 → 매수 → 만기 청산 순으로 처리한다.
+# 매수 금액 = min(현금, 비중 × 현재 총자산); 동시에 여러 종목을 사느라 현금이 모자라면 비중대로 나눠 쓴다.
+# 마지막 유효 봉까지 보유 중인 종목은 그 봉의 종가로 청산한다.
+def simulate_panel(matrix, signals, initial_balance, fee=0.001, weights=None, block_size=64):
+    n_assets, n_bars = matrix.shape
+    first, last = valid_span(matrix)
+    weights = [1.0 / max(n_assets, 1)] * n_assets if weights is None else [float(w) for w in weights]
+    prices = np.empty(matrix.shape, dtype=matrix.dtype)  # 요청한 dtype 유지 (float32 패널은 메모리 절반)
+    for lo in range(0, n_assets, block_size):
+        prices[lo:lo + block_size] = ffill(matrix[lo:lo + block_size])
+    np.nan_to_num(prices, copy=False)  # 상장 전 구간 (보유 수량이 0 이므로 평가액에 영향 없음)
+
+    # 체결 이벤트를 봉별 (매도, 매수, 만기 청산) 종목 목록으로 모아 둔다 (신호는 희소하므로 봉마다 전 종목을 훑지 않음)
+    events = {}
+    for kind, (assets, bars) in enumerate((np.nonzero(signals[:, :-1] == -1), np.nonzero(signals[:, :-1] == 1))):
+        for asset, bar in zip(assets.tolist(), (bars + 1).tolist()):
+            events.setdefault(bar, ([], [], []))[kind].append(asset)
+    for asset in np.flatnonzero(last >= first).tolist():
+        events.setdefault(int(last[asset]), ([], [], []))[2].append(asset)
+
+    cash = float(initial_balance)
+    qty, cost, asset_pnl, trade_count = [0.0] * n_assets, [0.0] * n_assets, [0.0] * n_assets, [0] * n_assets
+    held_qty = np.zeros(n_assets)  # 총자산 평가용 (qty 와 같은 값)
+    event_bars = np.array(sorted(events), dtype=np.int64)
+    cash_after, change_bars, change_assets, change_qty = [], [], [], []
+
+    def trade(t, asset, new_qty):
+        change_bars.append(t)
+        change_assets.append(asset)
+        change_qty.append(new_qty - qty[asset])
+        qty[asset] = held_qty[asset] = new_qty
+        trade_count[asset] += 1
+
+    def sell(t, asset):
+        nonlocal cash
+        proceeds = qty[asset] * prices.item(asset, t) * (1 - fee)
+        cash += proceeds
+        asset_pnl[asset] += proceeds - cost[asset]
+        trade(t, asset, 0.0)
+
+    for t in event_bars.tolist():
+        sells, buys, expiring = events[t]
+        for asset in sells:
+            if qty[asset] > 0:
+                sell(t, asset)
+        buys = [asset for asset in buys if qty[asset] == 0]
+        if buys and cash > 0:
+            equity = cash + float(held_qty @ prices[:, t])
+            spend = [weights[asset] * equity for asset in buys]
+            total = sum(spend)
+            if total > cash:
+                spend = [cash * value / total for value in spend]
+            for asset, value in zip(buys, spend):
+                cost[asset] = value
+                trade(t, asset, value * (1 - fee) / prices.item(asset, t))
+            cash = max(cash - sum(spend), 0.0)
+        for asset in expiring:
+            if qty[asset] > 0:
+                sell(t, asset)
+        cash_after.append(cash)
+
+    # 자산 곡선 = 현금 + Σ 보유 수량 × 종가 (보유 수량은 체결 봉의 변화량 누적, 종목 블록 단위로 합산)
+    state = np.searchsorted(event_bars, np.arange(n_bars), side='right') - 1
+    equity = np.asarray([float(initial_balance)] + cash_after)[state + 1]
+    cash_curve = equity.copy()
+    change_bars, change_assets = np.asarray(change_bars, dtype=np.int64), np.asarray(change_assets, dtype=np.int64)
+    change_qty = np.asarray(change_qty, dtype=np.float64)
+    for lo in range(0, n_assets, block_size):
+        hi = min(lo + block_size, n_assets)
+        inside = (change_assets >= lo) & (change_assets < hi)
+        if not inside.any():
+            continue
+        step = np.zeros((hi - lo, n_bars))
+        np.add.at(step, (change_assets[inside] - lo, change_bars[inside]), change_qty[inside])
+        holding = np.cumsum(step, axis=1)
+        equity += (holding * prices[lo:hi]).sum(axis=0)
+    return equity, cash_curve, np.asarray(trade_count, dtype=np.int64), np.asarray(asset_pnl)
+
+
+# 패널 백테스트: prices 는 일자 × 종목 (data_store.to_panel 결과 등), weights 는 종목별 목표 비중 (기본: 균등)
+# dtype=np.float32 로 주면 가격·지표 블록을 단정밀도로 계산해 메모리를 절반으로 줄인다.
+def run_panel_backtest(prices, params, initial_balance, fee=0.001, weights=None, dtype=np.float64, block_size=64):
+    matrix, dates, tickers = as_matrix(prices, dtype)
+    signals = panel_signals(matrix.T, params, dtype=dtype, block_size=block_size)
+    equity, cash, trade_count, asset_pnl = simulate_panel(matrix, signals, initial_balance, fee, weights, block_size)
+    return PanelResult(dates, tickers, equity, cash, initial_balance, trade_count, asset_pnl)
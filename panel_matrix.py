@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# ===== 패널(종목 × 일자) 행렬 공용 헬퍼 =====
+# 다종목 백테스트(panel)와 유니버스 다이버전스 스캔(divergence)이 함께 쓰는 행렬 변환·지표 계산
+
+
+# DataFrame(일자 × 종목) 또는 (일자, 종목) 배열 → (종목 × 일자) 연속 배열, 일자, 종목
+def as_matrix(prices, dtype):
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame()
+    if isinstance(prices, pd.DataFrame):
+        dates, tickers, values = prices.index, list(prices.columns), prices.to_numpy(dtype=dtype)
+    else:
+        values = np.asarray(prices, dtype=dtype)
+        if values.ndim == 1:
+            values = values[:, None]
+        dates, tickers = pd.RangeIndex(values.shape[0]), list(range(values.shape[1]))
+    return np.ascontiguousarray(values.T), dates, tickers
+
+
+# 종목별 유효 구간 [first, last] (데이터가 전혀 없으면 first > last)
+def valid_span(matrix):
+    valid = np.isfinite(matrix)
+    n = matrix.shape[1]
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), n)
+    last = np.where(valid.any(axis=1), n - 1 - valid[:, ::-1].argmax(axis=1), -1)
+    return first, last
+
+
+def _rolling_mean(frame, window):
+    return frame.rolling(window).mean().to_numpy().T
+
+
+# compute_rsi 와 같은 계산을 (일자 × 종목) 블록에 한 번에 적용
+# 상장 전 구간의 0 변동이 첫 RSI 창에 섞이지 않도록 종목별 첫 유효 봉 + period - 1 이전은 NaN
+def panel_rsi(block, first, period):
+    delta = np.diff(block, axis=1, prepend=np.nan)
+    gain = pd.DataFrame(np.where(delta > 0, delta, 0).T)
+    loss = pd.DataFrame(np.where(delta < 0, -delta, 0).T)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + _rolling_mean(gain, period) / _rolling_mean(loss, period))
+    rsi[np.arange(block.shape[1])[None, :] < (first + period - 1)[:, None]] = np.nan
+    return rsi
+
+
+def ffill(block):
+    return pd.DataFrame(block.T).ffill().to_numpy(dtype=block.dtype).T
@@ -0,0 +1,90 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from backtest_core import run_backtest_metrics
+from data_store import OHLCVStore
+
+NO_DATA = "데이터 없음"
+
+
+# "005930.KS (삼성전자)" → ("005930.KS", "삼성전자"), 이름이 없으면 티커를 그대로 이름으로 사용
+def split_stock_item(item):
+    ticker, _, name = item.partition(' ')
+    return ticker, (name.strip('()') or ticker)
+
+
+# categories 가 None 이면 전체 카테고리, 빈 목록이면 빈 유니버스
+def universe_from_options(stock_options, categories=None):
+    items = []
+    for category in (stock_options.keys() if categories is None else categories):
+        for item in stock_options[category]:
+            if item not in items:
+                items.append(item)
+    return items
+
+
+def _backtest_close(close, params, initial_balance, fee):
+    return run_backtest_metrics(close, params, initial_balance, fee).as_dict()
+
+
+# 종목 유니버스 평가 엔진
+# 데이터 로딩은 스레드 풀(네트워크/디스크 I/O), 백테스트는 프로세스 풀(CPU)에서 동시에 진행하고
+# 종목별 결과를 끝나는 순서대로 yield 한다. 한 종목의 실패는 해당 결과의 'error' 로만 기록된다.
+# evaluate(close, params, initial_balance, fee) → dict 로 종목별 작업을 바꿀 수 있다 (프로세스 풀로 보내므로 최상위 함수).
+def evaluate_universe(items, params, start, end, initial_balance, fee=0.001, store=None,
+                      load_workers=8, backtest_workers=None, evaluate=_backtest_close):
+    store = store or OHLCVStore()
+    items = list(items)
+    inline = backtest_workers == 1
+
+    def record(index, **values):
+        ticker, name = split_stock_item(items[index])
+        result = {'item': items[index], 'ticker': ticker, 'name': name, 'profit_pct': np.nan,
+                  'final_value': np.nan, 'trade_count': 0, 'max_drawdown': np.nan, 'bars': 0, 'error': None}
+        result.update(values)
+        return result
+
+    def load(index):
+        df = store.load(split_stock_item(items[index])[0], start, end)
+        return df['Close'].to_numpy(dtype=np.float64).ravel() if not df.empty else None
+
+    pool = None if inline else ProcessPoolExecutor(max_workers=backtest_workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+    try:
+        with ThreadPoolExecutor(max_workers=load_workers) as loader:
+            loading = {loader.submit(load, i): i for i in range(len(items))}
+            running = {}
+            bars = {}
+            while loading or running:
+                done, _ = wait(list(loading) + list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in loading:
+                        index = loading.pop(future)
+                        try:
+                            close = future.result()
+                        except Exception as e:
+                            yield record(index, error=str(e))
+                            continue
+                        if close is None:
+                            yield record(index, error=NO_DATA)
+                            continue
+                        bars[index] = len(close)
+                        if inline:
+                            try:
+                                yield record(index, bars=len(close),
+                                             **evaluate(close, params, initial_balance, fee))
+                            except Exception as e:
+                                yield record(index, bars=len(close), error=str(e))
+                        else:
+                            running[pool.submit(evaluate, close, params, initial_balance, fee)] = index
+                    else:
+                        index = running.pop(future)
+                        try:
+                            yield record(index, bars=bars[index], **future.result())
+                        except Exception as e:
+                            yield record(index, bars=bars[index], error=str(e))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,79 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+_DISABLED = nullcontext()
+
+
+# 단계별 타이머 + 카운터
+# hooks: 단계가 끝날 때마다 hook(stage, elapsed_seconds) 호출
+class BacktestProfile:
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] += elapsed
+            self.calls[name] += 1
+            for hook in self.hooks:
+                hook(name, elapsed)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def merge(self, other):
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+            self.calls[name] += other.calls[name]
+        for name, n in other.counters.items():
+            self.counters[name] += n
+        return self
+
+    @property
+    def total(self):
+        return sum(self.seconds.values())
+
+    def as_dict(self):
+        return {
+            'stages': {name: {'seconds': self.seconds[name], 'calls': self.calls[name]} for name in self.seconds},
+            'counters': dict(self.counters),
+            'total_seconds': self.total,
+        }
+
+    def to_frame(self):
+        import pandas as pd
+
+        total = self.total or 1.0
+        return pd.DataFrame(
+            [{'stage': name, 'seconds': s, 'calls': self.calls[name], 'share': s / total}
+             for name, s in self.seconds.items()]).set_index('stage') if self.seconds else pd.DataFrame()
+
+
+# 프로파일러가 없으면 재사용 가능한 nullcontext 를 돌려줘 비활성 시 추가 비용이 없도록 함
+def stage(profiler, name):
+    return _DISABLED if profiler is None else profiler.stage(name)
+
+
+# 최적화 시도별 소요 시간 분포 요약 (초 단위)
+def latency_summary(durations):
+    durations = np.asarray([d for d in durations if d is not None], dtype=np.float64)
+    if len(durations) == 0:
+        return {}
+    return {
+        'count': int(len(durations)),
+        'mean': float(durations.mean()),
+        'p50': float(np.percentile(durations, 50)),
+        'p90': float(np.percentile(durations, 90)),
+        'p99': float(np.percentile(durations, 99)),
+        'max': float(durations.max()),
+    }
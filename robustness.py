@@ -0,0 +1,163 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest_core import run_backtest_metrics, trade_events
+from panel import panel_signals
+
+METHODS = ("block_bootstrap", "noise")
+CHUNK_PATHS = 128
+# 경로 수 × 봉 수가 이 값 이상이면 프로세스 풀로 나눠 계산 (작은 작업은 프로세스 기동 비용이 더 큼)
+PARALLEL_MIN_CELLS = 2_000_000
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+# ===== 가상 가격 경로 생성 =====
+def _clean_close(close):
+    close = np.asarray(close, dtype=np.float64).ravel()
+    close = close[np.isfinite(close)]
+    if len(close) < 3 or (close <= 0).any():
+        raise ValueError("견고성 분석에는 양수 종가가 3개 이상 필요합니다.")
+    return close
+
+
+# 이동 블록 부트스트랩: 로그 수익률을 block_length 봉 단위로 무작위 복원 추출해 이어 붙인 경로 (시작가는 원래 첫 종가)
+# 블록 안의 자기상관(추세·변동성 군집)은 유지되고, 블록 사이 순서만 섞인다.
+def block_bootstrap_paths(close, n_paths, block_length=20, rng=None):
+    rng = rng or np.random.default_rng()
+    close = _clean_close(close)
+    returns = np.diff(np.log(close))
+    n = len(returns)
+    length = max(1, min(int(block_length), n))
+    n_blocks = -(-n // length)
+    starts = rng.integers(0, n - length + 1, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(length)).reshape(n_paths, -1)[:, :n]
+    log_path = np.empty((n_paths, n + 1))
+    log_path[:, 0] = np.log(close[0])
+    np.cumsum(returns[idx], axis=1, out=log_path[:, 1:])
+    log_path[:, 1:] += log_path[:, :1]
+    return np.exp(log_path, out=log_path)
+
+
+# 가격 노이즈: 원래 종가에 봉마다 독립적인 곱셈 노이즈 (표준편차 = noise × 일간 로그 수익률 표준편차)
+# 시장 흐름은 그대로 두고 신호가 작은 가격 차이에 얼마나 민감한지 본다.
+def noise_paths(close, n_paths, noise=0.5, rng=None):
+    rng = rng or np.random.default_rng()
+    close = _clean_close(close)
+    sigma = noise * np.std(np.diff(np.log(close)))
+    return close[None, :] * np.exp(rng.normal(0.0, sigma, size=(n_paths, len(close))))
+
+
+def generate_paths(close, n_paths, method="block_bootstrap", block_length=20, noise=0.5, rng=None):
+    if method == "block_bootstrap":
+        return block_bootstrap_paths(close, n_paths, block_length, rng)
+    if method == "noise":
+        return noise_paths(close, n_paths, noise, rng)
+    raise ValueError(f"지원하지 않는 경로 생성 방식입니다: {method} (가능: {METHODS})")
+
+
+# ===== 경로 일괄 평가 =====
+# (경로 × 일자) 가격 행렬 전체를 한 번에 평가 → 경로별 수익률(%), 최대 낙폭(%), 거래 수
+# 신호는 panel_signals(경로를 종목처럼 취급), 체결은 run_backtest_metrics 와 같은 규칙(다음 봉 종가, 끝까지 보유 시 청산)
+# 자산 = 초기 자본 × 체결 계수 누적곱 (보유 중이면 × 종가)
+def path_metrics(paths, params, initial_balance, fee=0.001, block_size=64):
+    paths = np.ascontiguousarray(paths, dtype=np.float64)
+    if int(params['kr_window']) >= paths.shape[1]:
+        raise ValueError("가격 경로가 kr_window 보다 짧습니다.")
+    signals = panel_signals(paths.T, params, block_size=block_size)
+    buys, sells = trade_events(signals)
+    buy_exec = np.zeros(paths.shape, dtype=bool)
+    sell_exec = np.zeros(paths.shape, dtype=bool)
+    buy_exec[:, 1:] = buys[:, :-1]
+    sell_exec[:, 1:] = sells[:, :-1]
+
+    factors = np.ones(paths.shape)
+    factors[buy_exec] = (1 - fee) / paths[buy_exec]
+    factors[sell_exec] = paths[sell_exec] * (1 - fee)
+    value = initial_balance * np.cumprod(factors, axis=1)
+    holding = np.cumsum(buy_exec, axis=1) > np.cumsum(sell_exec, axis=1)
+    equity = np.where(holding, value * paths, value)
+    open_end = holding[:, -1]
+    equity[open_end, -1] *= 1 - fee
+
+    final_value = equity[:, -1]
+    profit_pct = np.where(final_value == 0, -100.0, (final_value - initial_balance) / initial_balance * 100)
+    peak = np.fmax.accumulate(equity, axis=1)
+    max_drawdown = np.max(np.where(peak > 0, (peak - equity) / peak, 0.0), axis=1) * 100
+    trade_count = buy_exec.sum(axis=1) + sell_exec.sum(axis=1) + open_end
+    return profit_pct, max_drawdown, trade_count
+
+
+# 경로 묶음 하나: 시드와 묶음 번호로 난수를 정하므로 워커 수와 관계없이 같은 결과
+def _evaluate_chunk(close, params, initial_balance, fee, method, n_paths, block_length, noise, seed, chunk):
+    rng = np.random.default_rng([seed, chunk])
+    paths = generate_paths(close, n_paths, method, block_length, noise, rng)
+    return path_metrics(paths, params, initial_balance, fee)
+
+
+class RobustnessResult:
+    __slots__ = ('method', 'profit_pct', 'max_drawdown', 'trade_count', 'original')
+
+    def __init__(self, method, profit_pct, max_drawdown, trade_count, original):
+        self.method = method
+        self.profit_pct = profit_pct
+        self.max_drawdown = max_drawdown
+        self.trade_count = trade_count
+        self.original = original
+
+    def __repr__(self):
+        return (f"RobustnessResult(method={self.method}, paths={len(self.profit_pct)}, "
+                f"median_profit_pct={np.median(self.profit_pct):.4f}, loss_probability={self.loss_probability:.4f})")
+
+    @property
+    def loss_probability(self):
+        return float(np.mean(self.profit_pct < 0))
+
+    # 원래 가격의 수익률이 가상 경로 분포에서 몇 번째 백분위인지 (높을수록 원래 결과가 운에 기댄 것일 가능성)
+    @property
+    def original_percentile(self):
+        return float(np.mean(self.profit_pct <= self.original.profit_pct) * 100)
+
+    def summary(self):
+        rows = {}
+        for name, values in (("수익률 (%)", self.profit_pct), ("최대 낙폭 (%)", self.max_drawdown),
+                             ("거래 수", self.trade_count)):
+            rows[name] = {'평균': float(np.mean(values)),
+                          **{f"{int(q * 100)}%": float(np.quantile(values, q)) for q in QUANTILES}}
+        return pd.DataFrame(rows).T
+
+
+# 견고성 분석: 원래 종가에서 n_paths 개 가상 경로를 만들어 같은 파라미터로 일괄 평가
+# workers=None 이면 작업이 클 때 CPU 수만큼 프로세스를 쓰고, 1 이면 현재 프로세스에서 계산
+# progress(done, total) 로 경로 묶음 단위 진행 상황을 받는다.
+def run_robustness(close, params, initial_balance, fee=0.001, method="block_bootstrap", n_paths=1000,
+                   block_length=20, noise=0.5, seed=0, workers=None, chunk_size=CHUNK_PATHS, progress=None):
+    close = _clean_close(close)
+    if method not in METHODS:
+        raise ValueError(f"지원하지 않는 경로 생성 방식입니다: {method} (가능: {METHODS})")
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    jobs = [(close, params, initial_balance, fee, method, size, block_length, noise, seed, chunk)
+            for chunk, size in enumerate(sizes)]
+    workers = workers or os.cpu_count() or 1
+    parallel = workers > 1 and len(jobs) > 1 and n_paths * len(close) >= PARALLEL_MIN_CELLS
+
+    results = []
+    if parallel:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            for result in pool.map(_evaluate_chunk, *zip(*jobs)):
+                results.append(result)
+                if progress is not None:
+                    progress(len(results), len(jobs))
+    else:
+        for job in jobs:
+            results.append(_evaluate_chunk(*job))
+            if progress is not None:
+                progress(len(results), len(jobs))
+
+    profit_pct, max_drawdown, trade_count = (np.concatenate(parts) for parts in zip(*results))
+    original = run_backtest_metrics(close, params, initial_balance, fee)
+    return RobustnessResult(method, profit_pct, max_drawdown, trade_count, original)
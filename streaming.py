@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+from kernel_regression import local_linear_weights
+
+
+# 새 봉을 하나씩(또는 소량씩) 추가하며 전략 상태를 갱신하는 스트리밍 백테스트
+# run_backtest 와 같은 전략 로직을 봉 단위로 계산한다. (봉당 O(window + rsi_period + order²))
+#  - 극값은 좌우 extrema_order 개 이웃이 모두 들어온 시점에 확정된다.
+#    마지막 extrema_order 개 봉은 잠정 극값(argrelextrema 의 clip 규칙)으로 취급해, 결과를 낼 때마다 다시 계산한다.
+#  - 확정된 구간의 신호·포지션 상태만 누적하고, 잠정 구간은 상태를 복사해 재생한다.
+# 같은 데이터 전체에 run_backtest 를 실행한 결과와 (부동소수점 반올림 범위 안에서) 동일하다.
+class StreamingBacktest:
+    VOL_WINDOW = 20
+
+    def __init__(self, params, initial_balance, fee=0.001):
+        self.params = params
+        self.initial_balance = initial_balance
+        self.fee = fee
+        self.window = int(params['kr_window'])
+        self.rsi_period = int(params['rsi_period'])
+        self.order = int(params['extrema_order'])
+        if self.order < 1:
+            raise ValueError("extrema_order 는 1 이상이어야 합니다.")
+        try:
+            self._weights = local_linear_weights(self.window, params['kr_bandwidth']) if self.window >= 1 else None
+        except np.linalg.LinAlgError:
+            self._weights = None
+
+        self.dates = []
+        self.close = []
+        self.rsi = []
+        self.y_pred = []
+        self.band = []
+        self._gains = []
+        self._losses = []
+        self._band_signal = []
+
+        # 확정 구간 상태
+        self._committed = 0
+        self._max_idx = []
+        self._min_idx = []
+        self._bullish = []
+        self._bearish = []
+        self._bullish_p2 = set()
+        self._bearish_p2 = set()
+        self._filtered = []
+        self._state = {'last_signal': 0, 'balance': initial_balance, 'position': 0, 'buy_price': 0}
+        self._trades = []
+
+    def __len__(self):
+        return len(self.close)
+
+    # 새 봉 추가: close 는 스칼라 또는 배열, dates 를 생략하면 정수 위치를 인덱스로 사용
+    def update(self, close, dates=None):
+        values = np.atleast_1d(np.asarray(close, dtype=np.float64)).ravel()
+        if dates is None:
+            dates = range(len(self.close), len(self.close) + len(values))
+        elif np.ndim(dates) == 0 or isinstance(dates, (str, pd.Timestamp)):
+            dates = [dates]
+        for value, date in zip(values, dates):
+            self._append_bar(float(value), date)
+        return self
+
+    def _append_bar(self, value, date):
+        t = len(self.close)
+        self.dates.append(date)
+        self.close.append(value)
+
+        # RSI (pandas rolling mean 과 같은 정의: 첫 봉의 변화량은 0 으로 취급)
+        delta = value - self.close[t - 1] if t > 0 else np.nan
+        self._gains.append(delta if delta > 0 else 0.0)
+        self._losses.append(-delta if delta < 0 else 0.0)
+        p = self.rsi_period
+        if t >= p - 1:
+            avg_gain = sum(self._gains[t - p + 1:]) / p
+            avg_loss = sum(self._losses[t - p + 1:]) / p
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = np.float64(avg_gain) / np.float64(avg_loss)
+                self.rsi.append(float(100 - (100 / (1 + rs))))
+        else:
+            self.rsi.append(np.nan)
+
+        # 커널 회귀 예측 (직전 window 개 종가와 고정 가중치의 내적)
+        if self._weights is not None and t >= self.window:
+            self.y_pred.append(float(np.dot(self._weights, self.close[t - self.window:t])))
+        else:
+            self.y_pred.append(np.nan)
+
+        # 변동성 밴드
+        if t >= self.VOL_WINDOW - 1:
+            vol = np.std(self.close[t - self.VOL_WINDOW + 1:], ddof=1)
+            self.band.append(float(self.params['bb_k'] * vol))
+        else:
+            self.band.append(np.nan)
+
+        y_pred, band = self.y_pred[t], self.band[t]
+        if value > y_pred + band:
+            self._band_signal.append(-1.0)
+        elif value < y_pred - band:
+            self._band_signal.append(1.0)
+        else:
+            self._band_signal.append(0.0)
+
+        # 좌우 이웃이 모두 들어와 확정된 봉까지 상태 진행
+        while self._committed <= len(self.close) - 1 - self.order:
+            self._commit(self._committed)
+            self._committed += 1
+
+    # i 번째 봉이 극값인지 (현재 데이터 범위로 잘린 이웃과 비교, argrelextrema mode='clip' 과 동일)
+    def _is_extremum(self, i, kind):
+        lo, hi = max(0, i - self.order), min(len(self.close) - 1, i + self.order)
+        neighbors = self.close[lo:i] + self.close[i + 1:hi + 1]
+        if kind == "max":
+            return all(self.close[i] >= v for v in neighbors)
+        return all(self.close[i] <= v for v in neighbors)
+
+    def _divergence(self, p1, p2, kind):
+        y, rsi = self.close, self.rsi
+        if kind == "bullish":
+            return y[p2] < y[p1] and rsi[p2] > rsi[p1] and rsi[p2] <= self.params['rsi_oversold']
+        return y[p2] > y[p1] and rsi[p2] < rsi[p1] and rsi[p2] >= self.params['rsi_overbought']
+
+    def _signal(self, t, bullish_p2, bearish_p2):
+        if t in bearish_p2:
+            return -1.0
+        if t in bullish_p2:
+            return 1.0
+        return self._band_signal[t]
+
+    # 신호 필터링 + 체결 (i 시점 신호는 i+1 종가에 체결, 마지막 봉의 신호는 체결하지 않음)
+    def _step(self, t, signal, state, trades, filtered):
+        if signal != 0 and signal != state['last_signal']:
+            filtered.append(signal)
+            state['last_signal'] = signal
+        else:
+            filtered.append(0.0)
+            return
+        if t + 1 >= len(self.close):
+            return
+
+        fee = self.fee
+        price = self.close[t + 1]
+        date = self.dates[t + 1]
+        if signal == 1 and state['position'] == 0:
+            state['position'] = state['balance'] * (1 - fee) / price
+            state['buy_price'] = price
+            state['balance'] = 0
+            trades.append({'date': date, 'type': 'Buy', 'price': round(price, 3),
+                           'quantity': round(state['position'], 6), 'balance': round(state['balance'], 3),
+                           'profit': 0.0})
+        elif signal == -1 and state['position'] > 0:
+            position = state['position']
+            trade_profit = round(position * (price - state['buy_price']) * (1 - fee), 3)
+            state['balance'] = position * price * (1 - fee)
+            trades.append({'date': date, 'type': 'Sell', 'price': round(price, 3), 'quantity': round(position, 6),
+                           'balance': round(state['balance'], 3), 'profit': trade_profit})
+            state['position'] = 0
+            state['buy_price'] = 0
+
+    def _commit(self, i):
+        for kind, idx, name, p2_set, pairs in (("min", self._min_idx, "bullish", self._bullish_p2, self._bullish),
+                                               ("max", self._max_idx, "bearish", self._bearish_p2, self._bearish)):
+            if self._is_extremum(i, kind):
+                if idx and self._divergence(idx[-1], i, name):
+                    pairs.append((idx[-1], i))
+                    p2_set.add(i)
+                idx.append(i)
+        self._step(i, self._signal(i, self._bullish_p2, self._bearish_p2), self._state, self._trades, self._filtered)
+
+    # 잠정 구간(마지막 extrema_order 개 봉)을 현재 데이터 기준으로 재계산 (확정 상태는 건드리지 않음)
+    def _snapshot(self):
+        n = len(self.close)
+        pending = range(self._committed, n)
+        tail_bullish, tail_bearish = [], []
+        bullish_p2, bearish_p2 = set(), set()
+        for kind, idx, name, p2_set, pairs in (("min", self._min_idx, "bullish", bullish_p2, tail_bullish),
+                                               ("max", self._max_idx, "bearish", bearish_p2, tail_bearish)):
+            last = idx[-1] if idx else None
+            for i in pending:
+                if self._is_extremum(i, kind):
+                    if last is not None and self._divergence(last, i, name):
+                        pairs.append((last, i))
+                        p2_set.add(i)
+                    last = i
+
+        state = dict(self._state)
+        tail_trades, tail_filtered = [], []
+        for t in pending:
+            self._step(t, self._signal(t, bullish_p2, bearish_p2), state, tail_trades, tail_filtered)
+
+        # 보유 중이면 마지막 종가로 청산
+        balance, position = state['balance'], state['position']
+        if position > 0:
+            price = self.close[-1]
+            trade_profit = round(position * (price - state['buy_price']) * (1 - self.fee), 3)
+            balance = position * price * (1 - self.fee)
+            tail_trades.append({'date': self.dates[-1], 'type': 'Sell', 'price': round(price, 3),
+                                'quantity': round(position, 6), 'balance': round(balance, 3), 'profit': trade_profit})
+
+        final_value = balance if balance > 0 else position * self.close[-1]
+        if final_value == 0:
+            profit_pct = -100
+        else:
+            profit_pct = (final_value - self.initial_balance) / self.initial_balance * 100
+        return profit_pct, final_value, tail_trades, tail_filtered, tail_bullish, tail_bearish
+
+    # 현재 수익률·최종 자산·거래 수만 계산 (봉 전체 DataFrame 을 만들지 않음)
+    def summary(self):
+        if self.window >= len(self.close):
+            return -100, 0, 0
+        profit_pct, final_value, tail_trades, _, _, _ = self._snapshot()
+        return profit_pct, final_value, len(self._trades) + len(tail_trades)
+
+    # 현재까지의 봉 전체에 run_backtest 를 실행한 것과 같은 (profit_pct, final_value, trade_df, result_df, divergences)
+    def result(self):
+        if self.window >= len(self.close):
+            return -100, 0, pd.DataFrame(), pd.DataFrame(), []
+
+        profit_pct, final_value, tail_trades, tail_filtered, tail_bullish, tail_bearish = self._snapshot()
+        index = pd.Index(self.dates)
+        result_df = pd.DataFrame({'Close': self.close, 'RSI': self.rsi, 'y_pred': self.y_pred,
+                                  'band': self.band, 'signal': self._filtered + tail_filtered}, index=index)
+        divergences = ([(index[p1], index[p2], "bullish") for p1, p2 in self._bullish + tail_bullish] +
+                       [(index[p1], index[p2], "bearish") for p1, p2 in self._bearish + tail_bearish])
+        return profit_pct, final_value, pd.DataFrame(self._trades + tail_trades), result_df, divergences
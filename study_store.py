@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from optimizer import SEARCH_SPACE, params_key
+
+DEFAULT_STUDY_DB = os.environ.get(
+    "BACKTEST_STUDY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".optuna_studies.db"))
+# 이 시간보다 오래 RUNNING 으로 남은 시도는 중단된 세션의 잔여물로 보고 FAIL 처리
+STALE_AFTER = timedelta(minutes=30)
+
+
+def storage_url(path=DEFAULT_STUDY_DB):
+    return f"sqlite:///{path}"
+
+
+# 탐색 공간 식별자: 범위나 파라미터가 바뀌면 다른 스터디로 취급
+def search_space_id(space=SEARCH_SPACE):
+    return hashlib.blake2b(json.dumps(space, sort_keys=True).encode(), digest_size=6).hexdigest()
+
+
+def _day(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+# 스터디 이름: 종목 | 시작일 | 종료일 | 목적 함수 | 탐색 공간
+def study_name(ticker, start, end, objective="full", n_folds=None):
+    spec = objective if objective == "full" else f"{objective}{n_folds}"
+    return "|".join([ticker, _day(start), _day(end), spec, search_space_id()])
+
+
+def _fail_stale_trials(study):
+    import optuna
+
+    cutoff = datetime.now() - STALE_AFTER
+    for trial in study.get_trials(states=(optuna.trial.TrialState.RUNNING,)):
+        if trial.datetime_start is not None and trial.datetime_start < cutoff:
+            study.tell(trial.number, state=optuna.trial.TrialState.FAIL)
+
+
+# SQLite 에 저장된 스터디를 열거나 새로 만든다 (같은 키면 이전 시도를 이어서 사용)
+# sampler·pruner 는 저장되지 않으므로 실행할 때마다 지정한다.
+def open_study(ticker, start, end, objective="full", n_folds=None, path=DEFAULT_STUDY_DB, sampler=None, pruner=None):
+    import optuna
+
+    name = study_name(ticker, start, end, objective, n_folds)
+    study = optuna.create_study(study_name=name, storage=storage_url(path), direction="maximize",
+                                sampler=sampler, pruner=pruner, load_if_exists=True)
+    if not study.user_attrs:
+        for key, value in (('ticker', ticker), ('start', _day(start)), ('end', _day(end)),
+                           ('objective', objective), ('search_space', search_space_id())):
+            study.set_user_attr(key, value)
+    _fail_stale_trials(study)
+    return study
+
+
+def delete_study(study, path=DEFAULT_STUDY_DB):
+    import optuna
+
+    optuna.delete_study(study_name=study.study_name, storage=storage_url(path))
+
+
+# 워밍 스타트: 탐색 공간이 같은 다른 스터디(같은 종목의 다른 기간 → 다른 종목 순)의 상위 top_k 파라미터를
+# 대기열(enqueue_trial)에 넣는다. 이미 평가했거나 대기 중인 세트는 건너뛴다. 추가한 파라미터 목록을 반환.
+def warm_start(study, top_k=3, max_trials=10, path=DEFAULT_STUDY_DB):
+    import optuna
+
+    attrs = study.user_attrs
+    candidates = []
+    for summary in optuna.get_all_study_summaries(storage_url(path), include_best_trial=False):
+        other = summary.user_attrs
+        if summary.study_name == study.study_name or other.get('search_space') != attrs.get('search_space'):
+            continue
+        candidates.append((other.get('ticker') != attrs.get('ticker'), summary.study_name))
+
+    seen = {params_key(t.params) for t in study.get_trials()}
+    enqueued = []
+    for _, name in sorted(candidates):
+        other = optuna.load_study(study_name=name, storage=storage_url(path))
+        best = sorted(other.get_trials(states=(optuna.trial.TrialState.COMPLETE,)),
+                      key=lambda t: t.value, reverse=True)[:top_k]
+        for trial in best:
+            key = params_key(trial.params)
+            if key in seen:
+                continue
+            seen.add(key)
+            study.enqueue_trial(trial.params, user_attrs={'warm_start_from': name})
+            enqueued.append(trial.params)
+            if len(enqueued) >= max_trials:
+                return enqueued
+    return enqueued
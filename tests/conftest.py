@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# 저장소 최상위의 평면 모듈(backtest_core, panel, ...)을 tests/ 에서 바로 불러오기 위함
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest_core import DEFAULT_PARAMS  # noqa: E402
+from data_store import synthetic_prices  # noqa: E402
+
+# 밴드 신호·다이버전스·미청산 포지션이 모두 나오도록 고른 파라미터 세트
+PARAM_SETS = [
+    dict(DEFAULT_PARAMS),
+    {**DEFAULT_PARAMS, 'kr_window': 20, 'kr_bandwidth': 2.0, 'bb_k': 0.3, 'rsi_period': 7, 'extrema_order': 2,
+     'rsi_oversold': 40, 'rsi_overbought': 60},
+    {**DEFAULT_PARAMS, 'kr_window': 80, 'kr_bandwidth': 8.5, 'bb_k': 1.5, 'rsi_period': 21, 'extrema_order': 3},
+]
+
+
+@pytest.fixture(scope="session")
+def prices():
+    return synthetic_prices(400, seed=7)
+
+
+@pytest.fixture(scope="session")
+def param_sets():
+    return PARAM_SETS
+
+
+@pytest.fixture(params=range(len(PARAM_SETS)), ids=lambda i: f"params{i}")
+def params(request):
+    return PARAM_SETS[request.param]
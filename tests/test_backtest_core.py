@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_core import run_backtest, run_backtest_metrics, run_backtest_batch
+from kernel_regression import kernel_regression
+
+INITIAL_BALANCE = 10000
+FEE = 0.001
+
+
+# 벡터화 이전 run_backtest 의 봉 단위 루프를 그대로 옮긴 기준 구현 (커널 회귀는 statsmodels, 극값은 scipy)
+def reference_backtest(df, params, initial_balance, fee):
+    from scipy.signal import argrelextrema
+
+    close = df['Close']
+    delta = close.diff()
+    gain = pd.Series(np.where(delta > 0, delta, 0), index=close.index).rolling(params['rsi_period']).mean()
+    loss = pd.Series(np.where(delta < 0, -delta, 0), index=close.index).rolling(params['rsi_period']).mean()
+    rsi = (100 - (100 / (1 + gain / loss))).to_numpy()
+    y = close.to_numpy()
+    y_pred = kernel_regression(y, params['kr_window'], params['kr_bandwidth'], method="statsmodels")
+    band = (params['bb_k'] * pd.Series(y).rolling(20).std()).to_numpy()
+
+    order = int(params['extrema_order'])
+    divergences = []
+    local_min = argrelextrema(y, np.less_equal, order=order)[0]
+    for p1, p2 in zip(local_min[:-1], local_min[1:]):
+        if y[p2] < y[p1] and rsi[p2] > rsi[p1] and rsi[p2] <= params['rsi_oversold']:
+            divergences.append((df.index[p1], df.index[p2], "bullish"))
+    local_max = argrelextrema(y, np.greater_equal, order=order)[0]
+    for p1, p2 in zip(local_max[:-1], local_max[1:]):
+        if y[p2] > y[p1] and rsi[p2] < rsi[p1] and rsi[p2] >= params['rsi_overbought']:
+            divergences.append((df.index[p1], df.index[p2], "bearish"))
+
+    signal = np.zeros(len(y))
+    for i in range(len(y)):
+        if np.isnan(y_pred[i]) or np.isnan(band[i]):
+            continue
+        if y[i] > y_pred[i] + band[i]:
+            signal[i] = -1
+        elif y[i] < y_pred[i] - band[i]:
+            signal[i] = 1
+    for _, date_p2, kind in divergences:
+        signal[df.index.get_loc(date_p2)] = 1 if kind == "bullish" else -1
+
+    filtered = np.zeros(len(signal))
+    last_signal = 0
+    for i in range(len(signal)):
+        if signal[i] != 0 and signal[i] != last_signal:
+            filtered[i] = last_signal = signal[i]
+
+    balance, position, buy_price, trades = initial_balance, 0, 0, []
+    for i in range(len(y) - 1):
+        price, date = y[i + 1].item(), df.index[i + 1]
+        if filtered[i] == 1 and position == 0:
+            position, buy_price, balance = balance * (1 - fee) / price, price, 0
+            trades.append({'date': date, 'type': 'Buy', 'price': round(price, 3), 'quantity': round(position, 6),
+                           'balance': round(balance, 3), 'profit': 0.0})
+        elif filtered[i] == -1 and position > 0:
+            profit = round(position * (price - buy_price) * (1 - fee), 3)
+            balance = position * price * (1 - fee)
+            trades.append({'date': date, 'type': 'Sell', 'price': round(price, 3), 'quantity': round(position, 6),
+                           'balance': round(balance, 3), 'profit': profit})
+            position, buy_price = 0, 0
+    if position > 0:
+        price = float(y[-1])
+        profit = round(position * (price - buy_price) * (1 - fee), 3)
+        balance = position * price * (1 - fee)
+        trades.append({'date': df.index[-1], 'type': 'Sell', 'price': round(price, 3),
+                       'quantity': round(position, 6), 'balance': round(balance, 3), 'profit': profit})
+    final_value = balance if balance > 0 else position * y[-1].item()
+    profit_pct = -100 if final_value == 0 else (final_value - initial_balance) / initial_balance * 100
+    return profit_pct, final_value, pd.DataFrame(trades), filtered, divergences
+
+
+@pytest.mark.parametrize("kr_method", ["statsmodels", "numpy"])
+def test_run_backtest_matches_reference_loop(prices, params, kr_method):
+    pytest.importorskip("statsmodels")
+    pytest.importorskip("scipy")
+    expected_profit, expected_final, expected_trades, expected_signal, expected_divs = \
+        reference_backtest(prices, params, INITIAL_BALANCE, FEE)
+    profit_pct, final_value, trade_df, result_df, divergences = \
+        run_backtest(prices, params, INITIAL_BALANCE, FEE, kr_method=kr_method)
+
+    assert len(expected_trades) > 0
+    pd.testing.assert_frame_equal(trade_df, expected_trades)
+    np.testing.assert_array_equal(result_df['signal'].to_numpy(), expected_signal)
+    assert divergences == expected_divs
+    assert profit_pct == pytest.approx(expected_profit, rel=1e-12)
+    assert final_value == pytest.approx(expected_final, rel=1e-12)
+
+
+def test_metrics_fast_path_matches_run_backtest(prices, params):
+    profit_pct, final_value, trade_df, _, _ = run_backtest(prices, params, INITIAL_BALANCE, FEE)
+    metrics = run_backtest_metrics(prices['Close'].to_numpy(), params, INITIAL_BALANCE, FEE)
+    assert metrics.profit_pct == profit_pct
+    assert metrics.final_value == final_value
+    assert metrics.trade_count == len(trade_df)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 2])
+def test_batch_matches_metrics(prices, param_sets, chunk_size):
+    batch = run_backtest_batch(prices, param_sets, INITIAL_BALANCE, FEE, chunk_size=chunk_size)
+    for params, row in zip(param_sets, batch.itertuples()):
+        metrics = run_backtest_metrics(prices['Close'].to_numpy(), params, INITIAL_BALANCE, FEE)
+        assert row.profit_pct == pytest.approx(metrics.profit_pct, rel=1e-9)
+        assert row.trade_count == metrics.trade_count
@@ -0,0 +1,24 @@
+import json
+
+import batch_runner
+from data_store import OHLCVStore, SyntheticProvider
+
+
+def test_resume_without_end_reuses_checkpoint_window(tmp_path, monkeypatch):
+    store = OHLCVStore(str(tmp_path / "store"), SyntheticProvider())
+    output = str(tmp_path / "out.jsonl")
+    first = list(batch_runner.run_batch(["AAA"], "backtest", "2020-01-01", output=output, store=store, workers=1))
+
+    # 다음 날 종료일 없이 이어서 실행해도 끝난 종목은 다시 계산하지 않음
+    class NextDay(batch_runner.datetime):
+        @classmethod
+        def now(cls):
+            return batch_runner.datetime(2100, 1, 1)
+
+    monkeypatch.setattr(batch_runner, "datetime", NextDay)
+    second = list(batch_runner.run_batch(["AAA", "BBB"], "backtest", "2020-01-01", output=output, store=store,
+                                         workers=1))
+    assert [line['ticker'] for line in second] == ["BBB"]
+    assert second[0]['end'] == first[0]['end']
+    with open(output, encoding="utf-8") as f:
+        assert json.loads(f.readline())['header']['end'] == first[0]['end']
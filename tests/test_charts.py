@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from charts import _thin_markers, lttb_indices
+from data_store import synthetic_prices
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 500])
+def test_lttb_keeps_endpoints_and_order(n_out):
+    y = synthetic_prices(5000, seed=1)['Close'].to_numpy()
+    idx = lttb_indices(y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_spike_and_skips_nan():
+    y = np.sin(np.linspace(0, 20, 2000))
+    y[:50] = np.nan
+    y[1234] = 10.0
+    idx = lttb_indices(y, 100)
+    assert idx[0] == 50 and idx[-1] == 1999
+    assert 1234 in idx
+    assert np.isfinite(y[idx]).all()
+
+
+def test_lttb_short_input_passes_through():
+    y = np.arange(50.0)
+    np.testing.assert_array_equal(lttb_indices(y, 50), np.arange(50))
+    np.testing.assert_array_equal(lttb_indices(y, 100), np.arange(50))
+
+
+def test_thin_markers():
+    positions = np.arange(0, 10_000, 3)
+    thinned = _thin_markers(positions, 10_000, 500)
+    assert 0 < len(thinned) <= 500
+    assert thinned[0] == positions[0]
+    assert np.all(np.diff(thinned) > 0) and np.isin(thinned, positions).all()
+    # 봉 수가 한도 이하이거나 표시할 위치가 없으면 그대로
+    np.testing.assert_array_equal(_thin_markers(positions[:10], 400, 500), positions[:10])
+    assert len(_thin_markers(np.array([], dtype=np.int64), 10_000, 500)) == 0
@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import (OHLCV_COLUMNS, CSVProvider, OHLCVStore, RetryingProvider, SimulatedProvider,
+                        SyntheticProvider)
+
+START, END = "2024-01-01", "2024-07-01"
+
+
+# 처음 failures 번은 ConnectionError, 이후에는 합성 데이터를 돌려주는 제공자
+class FlakyProvider:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def fetch(self, ticker, start, end):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("일시 오류")
+        return SyntheticProvider().fetch(ticker, start, end)
+
+
+def test_retry_recovers_after_backoff():
+    flaky = FlakyProvider(failures=2)
+    provider = RetryingProvider(flaky, retries=3, backoff=0.05, min_interval=0.0)
+    began = time.monotonic()
+    df = provider.fetch("A", START, END)
+    elapsed = time.monotonic() - began
+    assert not df.empty and flaky.calls == 3
+    # 지터 하한(0.5배) 기준 0.05·0.5 + 0.1·0.5 이상 기다렸어야 함
+    assert elapsed >= 0.075
+
+
+def test_retry_gives_up_after_retries():
+    flaky = FlakyProvider(failures=10)
+    provider = RetryingProvider(flaky, retries=2, backoff=0.001, min_interval=0.0)
+    with pytest.raises(ConnectionError):
+        provider.fetch("A", START, END)
+    assert flaky.calls == 3
+
+
+def test_rate_limit_spaces_requests_per_ticker():
+    provider = RetryingProvider(SyntheticProvider(), min_interval=0.05)
+    began = time.monotonic()
+    for _ in range(3):
+        provider.fetch("A", START, END)
+    assert time.monotonic() - began >= 0.1
+    # 다른 종목은 앞선 종목의 간격을 기다리지 않음
+    began = time.monotonic()
+    for ticker in ("B", "C", "D"):
+        provider.fetch(ticker, START, END)
+    assert time.monotonic() - began < 0.1
+
+
+def test_load_many_fetches_concurrently(tmp_path):
+    tickers = [f"T{i}" for i in range(8)]
+    simulated = SimulatedProvider(latency=0.1, jitter=0.0, failure_rate=0.0)
+    store = OHLCVStore(str(tmp_path), RetryingProvider(simulated, min_interval=0.0))
+    began = time.monotonic()
+    frames, errors = store.load_many(tickers, START, END, workers=8)
+    # 순차 실행이면 0.8초 이상
+    assert time.monotonic() - began < 0.5
+    assert list(frames) == tickers and not errors
+    assert all(simulated.calls[t] == 1 for t in tickers)
+
+
+def test_failing_ticker_does_not_break_others(tmp_path):
+    simulated = SimulatedProvider(latency=0.0, jitter=0.0, failure_rate=0.0, fail_tickers={"BAD"})
+    store = OHLCVStore(str(tmp_path), RetryingProvider(simulated, retries=1, backoff=0.001, min_interval=0.0))
+    frames, errors = store.load_many(["A", "BAD", "B"], START, END)
+    assert list(frames) == ["A", "B"]
+    assert set(errors) == {"BAD"}
+    assert simulated.calls["BAD"] == 2
+
+
+# CSVProvider 를 감싸 요청 구간을 기록
+class RecordingProvider:
+    def __init__(self, provider):
+        self.provider = provider
+        self.requests = []
+
+    def fetch(self, ticker, start, end):
+        self.requests.append((str(start.date()), str(end.date())))
+        return self.provider.fetch(ticker, start, end)
+
+
+@pytest.fixture
+def csv_store(tmp_path):
+    index = pd.bdate_range("2023-01-02", "2023-12-29", name='Date')
+    close = np.arange(1.0, len(index) + 1)
+    df = pd.DataFrame({c: close for c in OHLCV_COLUMNS}, index=index)
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    df.to_csv(csv_dir / "A.csv")
+    provider = RecordingProvider(CSVProvider(str(csv_dir)))
+    return OHLCVStore(str(tmp_path / "store"), provider), provider, df
+
+
+def test_sub_range_is_sliced_from_store(csv_store):
+    store, provider, df = csv_store
+    store.load("A", "2023-01-01", "2023-12-01")
+    sub = store.load("A", "2023-03-01", "2023-04-01")
+    assert len(provider.requests) == 1
+    pd.testing.assert_frame_equal(sub, df.loc["2023-03-01":"2023-03-31"], check_freq=False, check_index_type=False)
+
+
+def test_only_missing_head_and_tail_are_fetched(csv_store):
+    store, provider, df = csv_store
+    store.load("A", "2023-03-01", "2023-06-01")
+    store.max_age = 0
+    full = store.load("A", "2023-01-01", "2023-09-01")
+    assert provider.requests[1:] == [("2023-01-01", "2023-03-01"), ("2023-06-01", "2023-09-01")]
+    pd.testing.assert_frame_equal(full, df.loc[:"2023-08-31"], check_freq=False, check_index_type=False)
+
+
+def test_empty_tail_keeps_coverage(csv_store):
+    store, provider, df = csv_store
+    store.load("A", "2023-01-01", "2024-01-01")
+    before = store._read_meta("A")
+    store.max_age = 0
+    assert len(store.load("A", "2023-01-01", "2024-03-01")) == len(df)
+    assert provider.requests[-1] == ("2023-12-30", "2024-03-01")
+    assert store._read_meta("A")['covered_end'] == before['covered_end'] == "2023-12-30"
+
+
+def test_load_returns_view_of_memory_mapped_arrays(csv_store):
+    store, _, _ = csv_store
+    store.load("A", "2023-01-01", "2024-01-01")
+    base = store.load("A", "2023-06-01", "2023-07-01").to_numpy()
+    while not isinstance(base, np.memmap):
+        assert base is not None, "저장소 배열의 복사본"
+        base = base.base
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_core import DEFAULT_PARAMS, compute_rsi
+from data_store import synthetic_prices
+from divergence import find_divergence_positions, find_panel_divergences, local_extrema, scan_universe
+
+PARAMS = {**DEFAULT_PARAMS, 'rsi_period': 7, 'extrema_order': 2, 'rsi_oversold': 40, 'rsi_overbought': 60}
+
+
+@pytest.fixture(scope="module")
+def panel():
+    close = np.stack([synthetic_prices(300, seed=seed)['Close'].to_numpy() for seed in range(5)])
+    rsi = np.stack([compute_rsi(pd.Series(row), PARAMS['rsi_period']).to_numpy() for row in close])
+    return close, rsi
+
+
+def test_panel_divergences_match_each_row(panel):
+    close, rsi = panel
+    rows, p1, p2, kind = find_panel_divergences(close, rsi, PARAMS['extrema_order'], PARAMS['rsi_oversold'],
+                                                PARAMS['rsi_overbought'])
+    assert len(rows) > 0
+    for row in range(len(close)):
+        local_max, local_min = local_extrema(close[row], PARAMS['extrema_order'])
+        expected = find_divergence_positions(close[row], rsi[row], local_min, local_max, PARAMS['rsi_oversold'],
+                                             PARAMS['rsi_overbought'])
+        selected = rows == row
+        for actual, wanted in zip((p1[selected], p2[selected], kind[selected]), expected):
+            np.testing.assert_array_equal(actual, wanted)
+
+
+def test_scan_universe_lookback(panel):
+    close, _ = panel
+    prices = pd.DataFrame(close.T, index=pd.bdate_range("2020-01-01", periods=close.shape[1]),
+                          columns=[f"T{i}" for i in range(len(close))])
+    found = scan_universe(prices, PARAMS)
+    recent = scan_universe(prices, PARAMS, lookback=30)
+    assert len(found) > len(recent) > 0
+    assert (recent['bars_ago'] < 30).all() and (recent['bars_ago'] >= 0).all()
+    assert recent['bars_ago'].is_monotonic_increasing
+    assert set(map(tuple, recent[['ticker', 'date_p2', 'kind']].to_numpy())) <= \
+        set(map(tuple, found[['ticker', 'date_p2', 'kind']].to_numpy()))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from backtest_core import run_backtest_metrics
+from indicator_cache import IndicatorCache, series_fingerprint
+
+
+def test_lru_eviction_by_count():
+    cache = IndicatorCache(maxsize=2)
+    for key in ("a", "b"):
+        cache.get_or_compute(key, lambda: np.zeros(1))
+    cache.get_or_compute("a", lambda: np.zeros(1))  # a 를 최근 사용으로
+    cache.get_or_compute("c", lambda: np.zeros(1))
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = IndicatorCache(maxsize=None, max_bytes=2000)
+    for key in ("a", "b", "c"):
+        cache.get_or_compute(key, lambda: np.zeros(100))  # 800 바이트씩
+    assert len(cache) == 2 and "a" not in cache
+    assert cache.stats()['nbytes'] == 1600
+    # 한도보다 큰 항목 하나는 남겨 둠
+    cache.get_or_compute("big", lambda: np.zeros(1000))
+    assert len(cache) == 1 and "big" in cache
+
+
+def test_stats_counters():
+    cache = IndicatorCache()
+    calls = []
+    for _ in range(3):
+        cache.get_or_compute("a", lambda: calls.append(1) or np.ones(3))
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+    cache.clear()
+    assert cache.stats()['hits'] == 0 and len(cache) == 0
+
+
+def test_per_run_delta_and_results_unchanged(prices, params):
+    close = prices['Close'].to_numpy()
+    cache = IndicatorCache()
+    first = run_backtest_metrics(close, params, 10000, 0.001, cache=cache)
+    before = cache.stats()
+    second = run_backtest_metrics(close, params, 10000, 0.001, cache=cache)
+    after = cache.stats()
+    # 같은 데이터·파라미터의 두 번째 실행은 모두 적중
+    assert after['misses'] - before['misses'] == 0
+    assert after['hits'] - before['hits'] == before['misses']
+    assert second.profit_pct == first.profit_pct == run_backtest_metrics(close, params, 10000, 0.001).profit_pct
+
+
+def test_cached_arrays_are_read_only():
+    cache = IndicatorCache()
+    value = cache.get_or_compute("a", lambda: (np.arange(3.0), [np.arange(2.0)]))
+    for array in (value[0], value[1][0], cache.get_or_compute("a", lambda: None)[0]):
+        with pytest.raises(ValueError):
+            array[0] = 1.0
+
+
+def test_series_fingerprint():
+    a = np.arange(10.0)
+    assert series_fingerprint(a) == series_fingerprint(list(a))
+    assert series_fingerprint(a) != series_fingerprint(a[:-1])
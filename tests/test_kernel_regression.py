@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from kernel_regression import kernel_regression
+
+pytest.importorskip("statsmodels")
+
+
+@pytest.mark.parametrize("window,bandwidth", [(20, 0.5), (50, 5.0), (100, 10.0)])
+def test_numpy_matches_statsmodels(prices, window, bandwidth):
+    y = prices['Close'].to_numpy()
+    expected = kernel_regression(y, window, bandwidth, method="statsmodels")
+    actual = kernel_regression(y, window, bandwidth, method="numpy")
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_window_longer_than_series_is_all_nan(prices):
+    y = prices['Close'].to_numpy()[:30]
+    assert np.isnan(kernel_regression(y, 30, 5.0)).all()
+
+
+def test_unknown_method_raises(prices):
+    with pytest.raises(ValueError):
+        kernel_regression(prices['Close'].to_numpy(), 20, 5.0, method="scipy")
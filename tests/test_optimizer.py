@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_core import run_backtest_metrics
+from data_store import synthetic_prices
+from optimizer import (SCALED_MINIMUMS, SEARCH_SPACE, WALK_FORWARD_MIN_FOLD, low_fidelity_close,
+                       optimize_multi_fidelity, params_key, scale_params, spearman, walk_forward_folds,
+                       walk_forward_objective)
+
+
+def test_walk_forward_folds_bounds():
+    folds, oos = walk_forward_folds(1000, n_folds=5, holdout=0.2, warmup=120)
+    assert len(folds) == 5
+    assert folds[0][1] == 120 and folds[-1][2] == 800
+    for (data_start, trade_start, end), (_, next_start, _) in zip(folds, folds[1:] + [(0, 800, 0)]):
+        assert data_start == trade_start - 120
+        assert end == next_start
+    assert oos == (680, 800, 1000)
+    assert walk_forward_folds(1000, n_folds=5, holdout=0.0, warmup=120)[1] is None
+
+
+def test_walk_forward_folds_reduces_fold_count():
+    folds, _ = walk_forward_folds(500, n_folds=5, holdout=0.2, warmup=120)
+    assert len(folds) == 2
+    assert all(end - trade_start >= WALK_FORWARD_MIN_FOLD for _, trade_start, end in folds)
+
+
+def test_walk_forward_folds_rejects_fewer_than_two_folds():
+    with pytest.raises(ValueError):
+        walk_forward_folds(300, n_folds=5, holdout=0.2, warmup=120)
+
+
+@pytest.mark.parametrize("pruner, state", [("nop", "COMPLETE"), ("threshold", "PRUNED")])
+def test_walk_forward_objective_pruning(pruner, state):
+    optuna = pytest.importorskip("optuna")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    close = synthetic_prices(1000, seed=3)['Close'].to_numpy()
+    # threshold: 첫 폴드 보고값이 하한(1e9%)보다 낮으므로 항상 가지치기
+    pruner = optuna.pruners.NopPruner() if pruner == "nop" else optuna.pruners.ThresholdPruner(lower=1e9)
+    study = optuna.create_study(direction="maximize", sampler=optuna.samplers.RandomSampler(seed=0), pruner=pruner)
+    study.optimize(walk_forward_objective(close, 10000, 0.001, n_folds=3), n_trials=3)
+
+    assert [t.state.name for t in study.trials] == [state] * 3
+    for trial in study.trials:
+        if state == "PRUNED":
+            assert list(trial.intermediate_values) == [0]
+        else:
+            assert len(trial.user_attrs['fold_profits']) == 3
+            assert np.isfinite(trial.user_attrs['oos_profit_pct'])
+
+
+def test_scale_params_divides_bar_lengths_and_keeps_thresholds():
+    params = {'kr_window': 100, 'kr_bandwidth': 10.0, 'bb_k': 1.0, 'rsi_period': 7, 'extrema_order': 3,
+              'rsi_oversold': 30, 'rsi_overbought': 70}
+    scaled = scale_params(params, 5.0)
+    assert scaled['kr_window'] == 20 and scaled['kr_bandwidth'] == pytest.approx(2.0)
+    # 하한 아래로는 줄이지 않음
+    assert scaled['rsi_period'] == SCALED_MINIMUMS['rsi_period'] and scaled['extrema_order'] == 1
+    assert {k: scaled[k] for k in ('bb_k', 'rsi_oversold', 'rsi_overbought')} == \
+        {k: params[k] for k in ('bb_k', 'rsi_oversold', 'rsi_overbought')}
+    assert scale_params(params, 1) == params and scale_params(params, 1) is not params
+
+
+def test_low_fidelity_close():
+    df = synthetic_prices(1000)
+    weekly, ratio = low_fidelity_close(df, "weekly")
+    assert len(weekly) == 200 and ratio == pytest.approx(5.0)
+    assert weekly[-1] == df['Close'].iloc[-1]
+    recent, ratio = low_fidelity_close(df, "recent", recent_fraction=0.25)
+    np.testing.assert_array_equal(recent, df['Close'].to_numpy()[750:])
+    assert ratio == 1.0
+    with pytest.raises(ValueError):
+        low_fidelity_close(df, "monthly")
+
+
+def test_spearman():
+    assert spearman([1, 2, 3, 4], [10, 20, 30, 40]) == pytest.approx(1.0)
+    assert spearman([1, 2, 3, 4], [4, 3, 2, 1]) == pytest.approx(-1.0)
+    assert spearman([1, 2, 3], [5, 5, 6]) == pytest.approx(np.sqrt(0.75))
+    assert np.isnan(spearman([1, 2], [1, 2])) and np.isnan(spearman([1, 2, 3], [1, 1, 1]))
+
+
+def test_multi_fidelity_records_full_resolution_params():
+    optuna = pytest.importorskip("optuna")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    df = synthetic_prices(1500, seed=3)
+    result = optimize_multi_fidelity(df, 20, 10000, 0.001, seed=1, top_fraction=0.2, n_audit=3)
+
+    low_params = [params_key(t.params) for t in result['low_study'].trials]
+    assert len(result['evaluated']) == result['top_k'] + 3
+    for trial in result['study'].trials:
+        # 전체 해상도 스터디에는 일봉 단위(탐색 공간 그대로)의 파라미터가 기록됨
+        assert params_key(trial.params) in low_params
+        for name, (_, low, high) in SEARCH_SPACE.items():
+            assert low <= trial.params[name] <= high
+        assert trial.value == run_backtest_metrics(df['Close'].to_numpy(), trial.params, 10000, 0.001).profit_pct
+
+
+def test_multi_fidelity_parallel_matches_serial():
+    optuna = pytest.importorskip("optuna")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    df = synthetic_prices(1500, seed=3)
+    serial = optimize_multi_fidelity(df, 20, 10000, 0.001, seed=1, top_fraction=0.2, n_audit=3)
+    parallel = optimize_multi_fidelity(df, 20, 10000, 0.001, seed=1, top_fraction=0.2, n_audit=3, n_workers=2)
+    pd.testing.assert_frame_equal(serial['evaluated'], parallel['evaluated'])
+    assert serial['spearman'] == parallel['spearman']
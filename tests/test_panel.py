@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_core import run_backtest_metrics
+from panel import panel_signals, run_panel_backtest, simulate_panel
+from panel_matrix import as_matrix
+
+INITIAL_BALANCE = 10000
+FEE = 0.001
+
+
+def test_single_ticker_panel_matches_metrics(prices, params):
+    result = run_panel_backtest(prices[['Close']].rename(columns={'Close': 'T'}), params, INITIAL_BALANCE, FEE)
+    metrics = run_backtest_metrics(prices['Close'].to_numpy(), params, INITIAL_BALANCE, FEE)
+    assert result.profit_pct == pytest.approx(metrics.profit_pct, rel=1e-9)
+    assert result.trade_count == metrics.trade_count
+
+
+def test_simulate_panel_keeps_float32_prices(prices, params):
+    panel = pd.DataFrame({f"T{i}": prices['Close'].to_numpy() * (1 + 0.1 * i) for i in range(3)}, index=prices.index)
+    panel.iloc[:50, 1] = np.nan  # 늦게 상장한 종목
+    matrix64, _, _ = as_matrix(panel, np.float64)
+    signals = panel_signals(panel, params)
+    equity64, cash64, trades64, _ = simulate_panel(matrix64, signals, INITIAL_BALANCE, FEE)
+    equity32, cash32, trades32, _ = simulate_panel(matrix64.astype(np.float32), signals, INITIAL_BALANCE, FEE)
+    np.testing.assert_array_equal(trades32, trades64)
+    np.testing.assert_allclose(equity32, equity64, rtol=1e-5)
+    np.testing.assert_allclose(cash32, cash64, rtol=1e-5, atol=1e-6)
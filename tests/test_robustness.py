@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from backtest_core import run_backtest_metrics
+from robustness import generate_paths, path_metrics
+
+INITIAL_BALANCE = 10000
+FEE = 0.001
+
+
+@pytest.mark.parametrize("method", ["block_bootstrap", "noise"])
+def test_path_metrics_match_metrics_per_path(prices, params, method):
+    paths = generate_paths(prices['Close'].to_numpy(), 8, method=method, rng=np.random.default_rng(0))
+    profit_pct, max_drawdown, trade_count = path_metrics(paths, params, INITIAL_BALANCE, FEE)
+    for i, path in enumerate(paths):
+        metrics = run_backtest_metrics(path, params, INITIAL_BALANCE, FEE)
+        assert profit_pct[i] == pytest.approx(metrics.profit_pct, rel=1e-9, abs=1e-9)
+        assert max_drawdown[i] == pytest.approx(metrics.max_drawdown, rel=1e-9, abs=1e-9)
+        assert trade_count[i] == metrics.trade_count
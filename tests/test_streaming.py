@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_core import run_backtest
+from streaming import StreamingBacktest
+
+INITIAL_BALANCE = 10000
+FEE = 0.001
+
+
+def test_streaming_matches_full_run(prices, params):
+    stream = StreamingBacktest(params, INITIAL_BALANCE, FEE)
+    close = prices['Close'].to_numpy()
+    # 한 봉씩, 여러 봉씩 섞어서 추가해도 같은 결과
+    for lo, hi in ((0, 150), (150, 151), (151, 290), (290, len(close))):
+        stream.update(close[lo:hi], prices.index[lo:hi])
+    profit_pct, final_value, trade_df, result_df, divergences = stream.result()
+    expected_profit, expected_final, expected_trades, expected_df, expected_divs = \
+        run_backtest(prices, params, INITIAL_BALANCE, FEE)
+
+    np.testing.assert_array_equal(result_df['signal'].to_numpy(), expected_df['signal'].to_numpy())
+    pd.testing.assert_frame_equal(trade_df.reset_index(drop=True), expected_trades)
+    assert sorted(divergences) == sorted(expected_divs)
+    assert profit_pct == pytest.approx(expected_profit, rel=1e-9)
+    assert final_value == pytest.approx(expected_final, rel=1e-9)
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pytest
+
+import study_store
+from optimizer import SEARCH_SPACE, suggest_params
+from study_store import open_study, study_name, warm_start
+
+optuna = pytest.importorskip("optuna")
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+PARAMS = {'kr_window': 50, 'kr_bandwidth': 5.0, 'bb_k': 1.0, 'rsi_period': 14, 'extrema_order': 5,
+          'rsi_oversold': 30, 'rsi_overbought': 70}
+
+
+def _objective(trial):
+    return trial.suggest_int('kr_window', *SEARCH_SPACE['kr_window'][1:]) / 10
+
+
+def test_study_name_is_stable():
+    name = study_name("005930.KS", "2020-01-01", "2023-05-31 12:00")
+    assert name == study_name("005930.KS", "2020-01-01 00:00", "2023-05-31")
+    assert name.startswith("005930.KS|2020-01-01|2023-05-31|full|")
+    assert study_name("005930.KS", "2020-01-01", "2023-05-31", "walk_forward", 5) != name
+
+
+def test_open_study_resumes_and_fails_stale_running_trials(tmp_path, monkeypatch):
+    path = str(tmp_path / "studies.db")
+    study = open_study("AAA", "2020-01-01", "2023-01-01", path=path)
+    study.optimize(_objective, n_trials=3)
+    running = study.ask()
+
+    monkeypatch.setattr(study_store, "STALE_AFTER", timedelta(0))
+    resumed = open_study("AAA", "2020-01-01", "2023-01-01", path=path)
+    states = [t.state.name for t in resumed.trials]
+    assert states == ["COMPLETE"] * 3 + ["FAIL"]
+    assert resumed.trials[running.number].state.name == "FAIL"
+    assert resumed.user_attrs['ticker'] == "AAA"
+
+
+def test_warm_start_enqueues_previous_best(tmp_path):
+    path = str(tmp_path / "studies.db")
+    previous = open_study("AAA", "2020-01-01", "2023-01-01", path=path)
+    previous.enqueue_trial(PARAMS)
+    previous.optimize(lambda trial: 100.0 if suggest_params(trial) == PARAMS else 0.0, n_trials=3)
+
+    study = open_study("AAA", "2020-01-01", "2024-01-01", path=path)
+    enqueued = warm_start(study, top_k=1, path=path)
+    assert enqueued == [PARAMS]
+    trial = study.ask()
+    assert suggest_params(trial) == PARAMS and trial.user_attrs['warm_start_from'] == previous.study_name
+    # 이미 대기 중인 세트는 다시 넣지 않음
+    assert warm_start(study, top_k=1, path=path) == []
@@ -1,26 +1,78 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import optuna
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-# import koreanize_matplotlib
 from datetime import date
-from backtest_core import run_backtest
-from data_loader import load_data
+from backtest_core import DEFAULT_PARAMS, run_backtest, run_backtest_metrics
+from indicator_cache import IndicatorCache
+from profiling import BacktestProfile, latency_summary
+from optimizer import (suggest_params, optimize_parallel, default_workers, walk_forward_objective, make_pruner,
+                       cached_objective, optimize_multi_fidelity, walk_forward_folds, WALK_FORWARD_MIN_FOLD)
+from study_store import open_study, warm_start, delete_study
+from data_loader import load_data, get_store
+from portfolio import evaluate_universe, universe_from_options, split_stock_item, NO_DATA
+from charts import render_backtest_chart
+from data_store import to_panel
+from panel import run_panel_backtest
+from divergence import scan_universe
+from robustness import run_robustness, METHODS as ROBUSTNESS_METHODS
 
-# ===== 한글 폰트 설정 (Windows 기준) =====
-# 1) 사용할 폰트 파일 경로 (Windows 기본: 맑은 고딕)
-font_path = r"C:\Windows\Fonts\malgun.ttf"
+# optuna·matplotlib 은 import 비용이 커서 실제로 최적화/차트를 실행할 때 불러온다.
 
-# 2) 폰트 매니저에 등록
-fm.fontManager.addfont(font_path)
-font_name = fm.FontProperties(fname=font_path).get_name()
 
-# 3) 전역 설정
-plt.rcParams["font.family"] = font_name
-plt.rcParams["axes.unicode_minus"] = False
-# =========================================
+# yfinance 에 데이터가 없는 것으로 알려진 종목 (목록에는 취소선으로 표시, 계산 시 '데이터 없음' 으로 건너뜀)
+NO_DATA_ITEMS = {"225010.KQ (넥슨게임즈)"}
+# 평균 수익률 페이지의 다이버전스 스캔 범위 (종목별 마지막 봉 기준 봉 수)
+SCAN_LOOKBACK = 20
+
+
+# Optuna 시도 간에 공유되는 지표 캐시 (가격 지문 + 파라미터 기준이라 세션 간 공유해도 안전)
+@st.cache_resource
+def get_indicator_cache():
+    return IndicatorCache(maxsize=256, max_bytes=512 * 1024 * 1024)
+
+
+# 렌더링된 차트 이미지 캐시 (결과 지문 + 표시 구간 기준)
+@st.cache_resource
+def get_chart_cache():
+    return IndicatorCache(maxsize=64, max_bytes=128 * 1024 * 1024)
+
+
+# 가격/RSI 차트: 구간 슬라이더로 확대하면 해당 구간만 원본 해상도로 다시 그린다
+def show_backtest_chart(key, result_df, divergences, title, price_label, rsi_levels):
+    first, last = result_df.index[0].date(), result_df.index[-1].date()
+    if first < last:
+        viewport = st.slider("차트 구간", min_value=first, max_value=last, value=(first, last),
+                             key=f"{key}_viewport_{first}_{last}")
+    else:
+        viewport = (first, last)
+    png = render_backtest_chart(result_df, divergences, title, price_label, rsi_levels,
+                                viewport=None if viewport == (first, last) else viewport, cache=get_chart_cache())
+    st.image(png)
+
+
+# 단계별 소요 시간/카운터 표
+def show_profile(profile, title="단계별 소요 시간"):
+    st.subheader(title)
+    frame = profile.to_frame()
+    st.dataframe(frame.style.format({'seconds': '{:.4f}', 'share': '{:.1%}'}))
+    st.bar_chart(frame['seconds'])
+    counters = dict(profile.counters)
+    if counters:
+        st.caption(" · ".join(f"{name}: {value:,}" for name, value in counters.items()))
+
+
+# Optuna 시도별 소요 시간 분포
+def show_trial_latency(study):
+    durations = [t.duration.total_seconds() for t in study.trials if t.duration is not None]
+    summary = latency_summary(durations)
+    if not summary:
+        return
+    st.subheader("시도별 소요 시간 분포")
+    st.write(f"평균 **{summary['mean'] * 1000:.1f} ms** · p50 {summary['p50'] * 1000:.1f} ms · "
+             f"p90 {summary['p90'] * 1000:.1f} ms · p99 {summary['p99'] * 1000:.1f} ms · "
+             f"최대 {summary['max'] * 1000:.1f} ms ({summary['count']}회)")
+    counts, edges = np.histogram(np.asarray(durations) * 1000, bins=min(30, max(5, len(durations) // 5)))
+    st.bar_chart(pd.DataFrame({'시도 수': counts}, index=[f"{e:.1f}" for e in edges[:-1]]))
 
 
 def setup_sidebar():
@@ -46,6 +98,78 @@ def setup_sidebar():
     
     return initial_balance, fee, page, stock_options
 
+def _histogram(values, label, bins=40):
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({label: counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 2))
+
+
+# 견고성 분석: 파라미터를 가상 가격 경로 수천 개에 일괄 적용한 수익률·최대 낙폭 분포
+# key 가 바뀌면(데이터·파라미터 변경) 저장된 결과를 표시하지 않는다.
+def show_robustness(key, close, params, initial_balance, fee):
+    st.subheader("견고성 분석 (가상 가격 경로)")
+    method_labels = {"block_bootstrap": "블록 부트스트랩", "noise": "가격 노이즈"}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        method = st.selectbox("경로 생성 방식", ROBUSTNESS_METHODS, format_func=method_labels.get, key="robust_method")
+    with col2:
+        n_paths = st.number_input("경로 수", min_value=100, max_value=20000, value=1000, step=100, key="robust_paths")
+    with col3:
+        block_length, noise = 20, 0.5
+        if method == "block_bootstrap":
+            block_length = st.number_input("블록 길이 (봉)", min_value=2, max_value=250, value=20, step=1,
+                                           key="robust_block")
+        else:
+            noise = st.slider("노이즈 크기 (일간 변동성 배수)", min_value=0.1, max_value=2.0, value=0.5, step=0.1,
+                              key="robust_noise")
+
+    if st.button("견고성 분석 실행"):
+        progress_bar = st.progress(0)
+        try:
+            result = run_robustness(close, params, initial_balance, fee, method=method, n_paths=int(n_paths),
+                                    block_length=int(block_length), noise=noise, workers=default_workers(),
+                                    progress=lambda done, total: progress_bar.progress(done / total))
+        except ValueError as e:
+            st.error(str(e))
+            result = None
+        progress_bar.empty()
+        st.session_state['robustness'] = (key, result)
+
+    saved = st.session_state.get('robustness')
+    if saved is None or saved[0] != key or saved[1] is None:
+        return
+    result = saved[1]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("중앙 수익률", f"{np.median(result.profit_pct):.2f}%")
+    col2.metric("하위 5% 수익률", f"{np.quantile(result.profit_pct, 0.05):.2f}%")
+    col3.metric("손실 확률", f"{result.loss_probability:.0%}")
+    col4.metric("원래 수익률의 분포 내 백분위", f"{result.original_percentile:.0f}%",
+                help=f"원래 가격 수익률 {result.original.profit_pct:.2f}%")
+    st.dataframe(result.summary().round(2))
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("수익률 (%) 분포")
+        st.bar_chart(_histogram(result.profit_pct, "경로 수"))
+    with col2:
+        st.caption("최대 낙폭 (%) 분포")
+        st.bar_chart(_histogram(result.max_drawdown, "경로 수"))
+
+
+# 다중 충실도 결과: 저충실도/일봉 순위 상관과 단계별 소요 시간, 일봉으로 재평가한 설정 표
+def show_multi_fidelity(result):
+    st.subheader("다중 충실도 결과")
+    evaluated = result['evaluated']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("순위 상관 (스피어만)", f"{result['spearman']:.2f}" if np.isfinite(result['spearman']) else "-",
+                help="일봉으로 재평가한 전체 설정(상위 + 무작위)의 저충실도/일봉 수익률 순위 상관")
+    col2.metric("일봉 재평가", f"{len(evaluated)}개", help=f"상위 {result['top_k']}개 + 무작위 {len(evaluated) - result['top_k']}개")
+    col3.metric("소요 시간", f"{result['low_seconds']:.1f}s + {result['full_seconds']:.1f}s",
+                help=f"저충실도 탐색 ({result['low_bars']}봉, 봉 길이 ×{result['ratio']:.1f}) + 일봉 재평가")
+    if len(evaluated):
+        st.dataframe(evaluated.sort_values('full_value', ascending=False, ignore_index=True)
+                     .rename(columns={'low_fidelity_value': '저충실도 수익률 (%)', 'full_value': '일봉 수익률 (%)',
+                                      'promoted': '상위 승격'}))
+
+
 def main_page(initial_balance, fee, stock_options):
     start_date = st.sidebar.date_input("시작일", pd.to_datetime("2025-01-01"))
     end_date = st.sidebar.date_input("종료일", pd.to_datetime("2025-08-26"))
@@ -55,11 +179,14 @@ def main_page(initial_balance, fee, stock_options):
     stock_ticker = selected_stock.split(' ')[0]
 
     df = load_data(stock_ticker, start_date, end_date)
+    data_key = (stock_ticker, start_date, end_date)
 
     if df.empty:
         st.error("데이터가 없습니다. 기간을 다시 설정하거나 다른 종목을 선택하세요.")
         st.stop()
 
+    enable_profiling = st.sidebar.checkbox("단계별 프로파일링 표시", value=False)
+
     st.header("수동 파라미터 설정 및 백테스트")
     with st.expander("수동 설정", expanded=True):
         col1, col2, col3 = st.columns(3)
@@ -92,114 +219,173 @@ def main_page(initial_balance, fee, stock_options):
 
         if st.button("수동 백테스트 실행"):
             with st.spinner("백테스트 실행 중..."):
-                profit_pct, final_value, trade_df, result_df, divergences = run_backtest(df, manual_params, initial_balance, fee)
+                profile = BacktestProfile() if enable_profiling else None
+                profit_pct, final_value, trade_df, result_df, divergences = run_backtest(
+                    df, manual_params, initial_balance, fee, profiler=profile)
 
                 st.subheader("백테스트 결과")
                 st.write(f"최종 자산: **{final_value:,.2f} USD**")
                 st.write(f"수익률: **{profit_pct:.2f}%**")
+                if profile is not None:
+                    show_profile(profile)
 
                 st.subheader("거래 내역")
                 st.dataframe(trade_df)
 
-                st.subheader("차트 시각화")
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 12), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
-
-                ax1.plot(result_df.index, result_df['Close'], color='blue', label=f'{stock_ticker} 종가')
-                if 'y_pred' in result_df and 'band' in result_df:
-                    ax1.plot(result_df.index, result_df['y_pred'], color='orange', linestyle='--', label='커널 회귀 예측')
-                    ax1.fill_between(result_df.index, result_df['y_pred'] - result_df['band'],
-                                     result_df['y_pred'] + result_df['band'], color='gray', alpha=0.2, label='변동성 밴드')
-                buy_idx = np.where(result_df['signal'] == 1)[0]
-                sell_idx = np.where(result_df['signal'] == -1)[0]
-                ax1.scatter(result_df.index[buy_idx], result_df['Close'].iloc[buy_idx], marker='^', color='green',
-                            label='매수 신호', alpha=0.8, s=100)
-                ax1.scatter(result_df.index[sell_idx], result_df['Close'].iloc[sell_idx], marker='v', color='red',
-                            label='매도 신호', alpha=0.8, s=100)
-
-                bullish_plotted, bearish_plotted = False, False
-                for start_date_div, end_date_div, div_type in divergences:
-                    p1_price = result_df.loc[start_date_div]['Close']
-                    p2_price = result_df.loc[end_date_div]['Close']
-                    if div_type == "bullish":
-                        if not bullish_plotted:
-                            ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='lime', linestyle='--', label='강세 다이버전스', linewidth=2)
-                            bullish_plotted = True
-                        else:
-                            ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='lime', linestyle='--', linewidth=2)
-                    elif div_type == "bearish":
-                        if not bearish_plotted:
-                            ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='magenta', linestyle='--', label='약세 다이버전스', linewidth=2)
-                            bearish_plotted = True
-                        else:
-                            ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='magenta', linestyle='--', linewidth=2)
-                ax1.set_title(f"{stock_ticker} 가격 및 매매 신호")
-                ax1.legend()
-                ax1.grid(True)
-                ax1.tick_params(labelbottom=True)
-                
-                ax2.plot(result_df.index, result_df["RSI"], label="RSI", color="blue")
-                ax2.axhline(manual_params['rsi_overbought'], color="red", linestyle="--", alpha=0.5, label='과매수')
-                ax2.axhline(manual_params['rsi_oversold'], color="green", linestyle="--", alpha=0.5, label='과매도')
-                
-                bullish_plotted, bearish_plotted = False, False
-                for start_date_div, end_date_div, div_type in divergences:
-                    p1_rsi = result_df.loc[start_date_div]['RSI']
-                    p2_rsi = result_df.loc[end_date_div]['RSI']
-                    if div_type == "bullish":
-                        if not bullish_plotted:
-                            ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='lime', linestyle='--', label='강세 다이버전스', linewidth=2)
-                            bullish_plotted = True
-                        else:
-                            ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='lime', linestyle='--', linewidth=2)
-                    elif div_type == "bearish":
-                        if not bearish_plotted:
-                            ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='magenta', linestyle='--', label='약세 다이버전스', linewidth=2)
-                            bearish_plotted = True
-                        else:
-                            ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='magenta', linestyle='--', linewidth=2)
-                
-                ax2.set_title("RSI")
-                ax2.legend()
-                ax2.grid(True)
-                
-                plt.tight_layout()
-                st.pyplot(fig)
+                st.session_state['manual_chart'] = (data_key, result_df, divergences, manual_params)
+
+        # 차트는 세션에 보관해 구간을 바꿔 다시 실행(rerun)해도 유지
+        chart = st.session_state.get('manual_chart')
+        if chart is not None and chart[0] == data_key and not chart[1].empty:
+            _, result_df, divergences, chart_params = chart
+            st.subheader("차트 시각화")
+            show_backtest_chart('manual', result_df, divergences, f"{stock_ticker} 가격 및 매매 신호",
+                                f'{stock_ticker} 종가',
+                                (chart_params['rsi_overbought'], chart_params['rsi_oversold']))
 
     st.header("Optuna 기반 파라미터 최적화")
     st.write("베이지안 최적화를 통해 가장 높은 수익률을 내는 파라미터를 자동으로 찾아냅니다.")
     n_trials = st.number_input("최적화 시도 횟수", min_value=10, value=100, step=10)
+    indicator_cache = get_indicator_cache()
+    close = df['Close'].to_numpy().ravel()
+
+    n_workers = st.number_input("병렬 워커 수 (프로세스)", min_value=1, max_value=default_workers(),
+                                value=1, step=1)
+
+    objective_labels = {"full": "전체 기간 수익률", "walk_forward": "워크포워드 (폴드별 가지치기)"}
+    objective_mode = st.radio("목적 함수", list(objective_labels), format_func=objective_labels.get, horizontal=True)
+    walk_forward = objective_mode == "walk_forward"
+    n_folds, pruner_name = 5, "median"
+    if walk_forward:
+        col1, col2 = st.columns(2)
+        with col1:
+            n_folds = st.number_input("폴드 수", min_value=2, max_value=20, value=5, step=1)
+        with col2:
+            pruner_labels = {"median": "중앙값 (MedianPruner)", "successive_halving": "연속 절반 (SuccessiveHalving)"}
+            pruner_name = st.selectbox("가지치기 방식", list(pruner_labels), format_func=pruner_labels.get)
+        st.caption("마지막 20% 구간은 최적화에 쓰지 않고 끝까지 진행한 시도의 표본 외 수익률로만 기록합니다.")
+        try:
+            folds, _ = walk_forward_folds(len(close), n_folds)
+        except ValueError as e:
+            st.error(f"{e} 기간을 늘리거나 '전체 기간 수익률' 목적 함수를 사용하세요.")
+            st.stop()
+        if len(folds) < n_folds:
+            st.info(f"폴드당 최소 {WALK_FORWARD_MIN_FOLD}봉을 확보하도록 폴드 수를 {len(folds)}개로 줄였습니다.")
+            n_folds = len(folds)
+    multi_fidelity = not walk_forward and st.checkbox(
+        "다중 충실도 (저해상도 탐색 → 상위 설정만 일봉 재평가)",
+        help="주봉 또는 최근 구간에서 먼저 탐색하고, 상위 설정과 비교용 무작위 설정만 전체 일봉으로 다시 평가합니다.")
+    if multi_fidelity:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            fidelity_labels = {"weekly": "주봉 (파라미터 기간 ÷ 봉 길이)", "recent": "최근 구간 (일봉)"}
+            fidelity = st.selectbox("저충실도 데이터", list(fidelity_labels), format_func=fidelity_labels.get)
+        with col2:
+            top_percent = st.number_input("일봉 재평가 상위 비율 (%)", min_value=1, max_value=100, value=10, step=1)
+        with col3:
+            n_audit = st.number_input("순위 비교용 무작위 설정 수", min_value=0, max_value=100, value=10, step=1)
+
+    trial_profile = BacktestProfile() if enable_profiling else None
 
     def objective(trial):
-        kr_window_trial = trial.suggest_int('kr_window', 20, 100)
-        kr_bandwidth_trial = trial.suggest_float('kr_bandwidth', 0.5, 10.0)
-        bb_k_trial = trial.suggest_float('bb_k', 0.1, 2.0)
-        rsi_period_trial = trial.suggest_int('rsi_period', 7, 21)
-        extrema_order_trial = trial.suggest_int('extrema_order', 3, 10)
-        rsi_oversold_trial = trial.suggest_int('rsi_oversold', 20, 40)
-        rsi_overbought_trial = trial.suggest_int('rsi_overbought', 60, 80)
-
-        params = {
-            'kr_window': kr_window_trial, 'kr_bandwidth': kr_bandwidth_trial, 'bb_k': bb_k_trial,
-            'rsi_period': rsi_period_trial, 'extrema_order': extrema_order_trial,
-            'rsi_oversold': rsi_oversold_trial, 'rsi_overbought': rsi_overbought_trial,
-        }
-        profit_pct, _, _, _, _ = run_backtest(df, params, initial_balance, fee)
-        return profit_pct
+        params = suggest_params(trial)
+        return run_backtest_metrics(close, params, initial_balance, fee, cache=indicator_cache,
+                                    profiler=trial_profile).profit_pct
+
+    col1, col2 = st.columns(2)
+    with col1:
+        persist_study = st.checkbox("스터디 저장 및 이어하기 (SQLite)", value=True,
+                                    help="종목·기간·목적 함수·탐색 공간이 같으면 이전 시도에 이어서 최적화합니다.")
+    with col2:
+        use_warm_start = st.checkbox("관련 스터디의 상위 파라미터로 워밍 스타트", value=True,
+                                     disabled=not persist_study or multi_fidelity)
+    if multi_fidelity:
+        st.caption("다중 충실도에서는 저충실도 상위 설정을 순서대로 재평가하므로 워밍 스타트를 쓰지 않습니다."
+                   + (f" 저충실도 탐색은 현재 프로세스에서, 일봉 재평가는 병렬 워커 {n_workers}개로 실행합니다."
+                      if n_workers > 1 else ""))
+
+    if persist_study and st.button("저장된 스터디 초기화"):
+        delete_study(open_study(stock_ticker, start_date, end_date, objective_mode, n_folds))
+        st.success("저장된 스터디를 삭제했습니다.")
 
     if st.button(f"Optuna 최적화 시작 ({n_trials}회 시도)"):
+        import optuna
+
+        # 지표 캐시는 세션 간 공유되므로 이번 실행 전후 카운터 차이만 표시
+        stats_before = indicator_cache.stats()
+
+        # sampler·pruner 는 스터디에 저장되지 않으므로 실행마다 지정
+        sampler = optuna.samplers.TPESampler(constant_liar=True) if n_workers > 1 else None
+        pruner = make_pruner(pruner_name) if walk_forward else None
+        previous, warm = 0, []
+        if persist_study:
+            study = open_study(stock_ticker, start_date, end_date, objective_mode, n_folds, sampler=sampler, pruner=pruner)
+            previous = len(study.trials)
+            # 다중 충실도는 큐에 넣은 후보 순서대로 결과를 맞추므로 워밍 스타트 후보를 섞지 않는다
+            if previous == 0 and use_warm_start and not multi_fidelity:
+                warm = warm_start(study)
+        else:
+            study = optuna.create_study(direction="maximize", sampler=sampler, pruner=pruner)
+        if previous:
+            st.info(f"저장된 스터디에 이어서 실행합니다. (이전 시도 {previous}회)")
+        if warm:
+            st.info(f"관련 스터디의 상위 파라미터 {len(warm)}개를 먼저 평가합니다.")
+
+        multi_result = None
         with st.spinner("최적화 진행 중... 잠시 기다려주세요."):
             status_placeholder = st.empty()
             status_placeholder.info(f"0 / {n_trials} 시도 완료")
-            study = optuna.create_study(direction="maximize")
-            for i in range(n_trials):
-                study.optimize(objective, n_trials=1)
-                status_placeholder.info(f"{i + 1} / {n_trials} 시도 완료")
+            if multi_fidelity:
+                stage_labels = {"low": "저충실도 탐색", "full": "일봉 재평가"}
+                multi_result = optimize_multi_fidelity(
+                    df, n_trials, initial_balance, fee, study=study, fidelity=fidelity, top_fraction=top_percent / 100,
+                    n_audit=n_audit, cache=indicator_cache, n_workers=n_workers,
+                    callback=lambda done, total, stage: status_placeholder.info(
+                        f"{stage_labels[stage]}: {done} / {total} 시도 완료"))
+            elif n_workers > 1:
+                optimize_parallel(
+                    df, n_trials, initial_balance, fee, n_workers=n_workers, study=study,
+                    callback=lambda done, total, _: status_placeholder.info(f"{done} / {total} 시도 완료"),
+                    objective=objective_mode, n_folds=n_folds)
+            else:
+                if walk_forward:
+                    objective = walk_forward_objective(close, initial_balance, fee, n_folds=n_folds,
+                                                       cache=indicator_cache, profiler=trial_profile)
+                objective = cached_objective(study, objective)
+                for i in range(n_trials):
+                    study.optimize(objective, n_trials=1)
+                    status_placeholder.info(f"{i + 1} / {n_trials} 시도 완료")
         st.success("최적화 완료!")
         status_placeholder.empty()
+        cached = sum(bool(t.user_attrs.get('cached')) for t in study.trials[previous:])
+        if cached:
+            st.caption(f"이미 평가한 파라미터 세트 {cached}회는 저장된 결과를 재사용했습니다.")
+        if multi_result is not None:
+            show_multi_fidelity(multi_result)
+        if n_workers == 1:
+            cache_stats = indicator_cache.stats()
+            hits = cache_stats['hits'] - stats_before['hits']
+            misses = cache_stats['misses'] - stats_before['misses']
+            evictions = cache_stats['evictions'] - stats_before['evictions']
+            st.caption(f"이번 실행 지표 캐시: 적중 {hits}회 / 미스 {misses}회 "
+                       f"(적중률 {hits / max(hits + misses, 1):.0%}, 제거 {evictions}개, 현재 보관 {cache_stats['size']}개)")
+        if enable_profiling:
+            show_trial_latency(study)
+            if trial_profile is not None and trial_profile.seconds:
+                show_profile(trial_profile, title="전체 시도 단계별 누적 시간")
 
         st.subheader("최적의 파라미터")
         st.json(study.best_params)
-        st.write(f"최대 수익률: `{study.best_value:.2f}%`")
+        if walk_forward:
+            states = [t.state.name for t in study.trials]
+            st.write(f"폴드 평균 수익률: `{study.best_value:.2f}%` "
+                     f"(완료 {states.count('COMPLETE')}회 / 가지치기 {states.count('PRUNED')}회)")
+            best_attrs = study.best_trial.user_attrs
+            st.write("폴드별 수익률: " + ", ".join(f"`{p:.2f}%`" for p in best_attrs.get('fold_profits', [])))
+            if 'oos_profit_pct' in best_attrs:
+                st.write(f"표본 외 수익률: `{best_attrs['oos_profit_pct']:.2f}%`")
+        else:
+            st.write(f"최대 수익률: `{study.best_value:.2f}%`")
         st.write("---")
 
         st.subheader("최적 파라미터로 백테스트 결과")
@@ -211,87 +397,81 @@ def main_page(initial_balance, fee, stock_options):
             st.subheader("최적화된 거래 내역")
             st.dataframe(best_trade_df)
             
-            st.subheader("최적 파라미터 차트")
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 12), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
-            
-            ax1.plot(best_result_df.index, best_result_df['Close'], color='blue', label=f'{stock_ticker} 종가')
-            if 'y_pred' in best_result_df and 'band' in best_result_df:
-                ax1.plot(best_result_df.index, best_result_df['y_pred'], color='orange', linestyle='--', label='커널 회귀 예측')
-                ax1.fill_between(best_result_df.index, best_result_df['y_pred'] - best_result_df['band'],
-                                 best_result_df['y_pred'] + best_result_df['band'], color='gray', alpha=0.2, label='변동성 밴드')
-            buy_idx = np.where(best_result_df['signal'] == 1)[0]
-            sell_idx = np.where(best_result_df['signal'] == -1)[0]
-            ax1.scatter(best_result_df.index[buy_idx], best_result_df['Close'].iloc[buy_idx], marker='^', color='green', label='매수 신호', alpha=0.8, s=100)
-            ax1.scatter(best_result_df.index[sell_idx], best_result_df['Close'].iloc[sell_idx], marker='v', color='red', label='매도 신호', alpha=0.8, s=100)
-            
-            bullish_plotted, bearish_plotted = False, False
-            for start_date_div, end_date_div, div_type in best_divergences:
-                p1_price = best_result_df.loc[start_date_div]['Close']
-                p2_price = best_result_df.loc[end_date_div]['Close']
-                if div_type == "bullish":
-                    if not bullish_plotted:
-                        ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='lime', linestyle='--', label='강세 다이버전스', linewidth=2)
-                        bullish_plotted = True
-                    else:
-                        ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='lime', linestyle='--', linewidth=2)
-                elif div_type == "bearish":
-                    if not bearish_plotted:
-                        ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='magenta', linestyle='--', label='약세 다이버전스', linewidth=2)
-                        bearish_plotted = True
-                    else:
-                        ax1.plot([start_date_div, end_date_div], [p1_price, p2_price], color='magenta', linestyle='--', linewidth=2)
-            ax1.set_title(f"{stock_ticker} 가격 및 최적화된 매매 신호")
-            ax1.legend()
-            ax1.grid(True)
-            ax1.tick_params(labelbottom=True)
-            
-            ax2.plot(best_result_df.index, best_result_df["RSI"], label="RSI", color="blue")
-            ax2.axhline(study.best_params['rsi_overbought'], color="red", linestyle="--", alpha=0.5, label='과매수')
-            ax2.axhline(study.best_params['rsi_oversold'], color="green", linestyle="--", alpha=0.5, label='과매도')
-            
-            bullish_plotted, bearish_plotted = False, False
-            for start_date_div, end_date_div, div_type in best_divergences:
-                p1_rsi = best_result_df.loc[start_date_div]['RSI']
-                p2_rsi = best_result_df.loc[end_date_div]['RSI']
-                if div_type == "bullish":
-                    if not bullish_plotted:
-                        ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='lime', linestyle='--', label='강세 다이버전스', linewidth=2)
-                        bullish_plotted = True
-                    else:
-                        ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='lime', linestyle='--', linewidth=2)
-                elif div_type == "bearish":
-                    if not bearish_plotted:
-                        ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='magenta', linestyle='--', label='약세 다이버전스', linewidth=2)
-                        bearish_plotted = True
-                    else:
-                        ax2.plot([start_date_div, end_date_div], [p1_rsi, p2_rsi], color='magenta', linestyle='--', linewidth=2)
-            ax2.set_title("RSI")
-            ax2.legend()
-            ax2.grid(True)
-            plt.tight_layout()
-            st.pyplot(fig)
+            st.session_state['best_chart'] = (data_key, best_result_df, best_divergences, study.best_params)
+
+    chart = st.session_state.get('best_chart')
+    if chart is not None and chart[0] == data_key and not chart[1].empty:
+        _, best_result_df, best_divergences, best_params = chart
+        st.subheader("최적 파라미터 차트")
+        show_backtest_chart('best', best_result_df, best_divergences, f"{stock_ticker} 가격 및 최적화된 매매 신호",
+                            f'{stock_ticker} 종가', (best_params['rsi_overbought'], best_params['rsi_oversold']))
+        show_robustness((data_key, tuple(sorted(best_params.items()))), close, best_params, initial_balance, fee)
+
+
+def _profit_table(items, profits):
+    return pd.DataFrame({
+        "종목": [split_stock_item(item)[1] for item in items],
+        "티커": [split_stock_item(item)[0] for item in items],
+        "수익률 (%)": profits
+    })
+
+
+# 성공한 종목들의 종가 패널 (일자 × 티커, 저장소에서 읽음)과 티커 → 종목명
+def _universe_panel(items, start, end):
+    tickers = [split_stock_item(item)[0] for item in items]
+    frames, _ = get_store().load_many(tickers, start, end)
+    return (to_panel(frames) if frames else None), dict(reversed([split_stock_item(item) for item in items]))
+
+
+# 공유 자본 포트폴리오: 성공한 종목을 같은 날짜 축에 맞춰 균등 비중으로 한 계좌에서 운용
+def show_portfolio_result(prices, names, params, initial_balance, fee):
+    result = run_panel_backtest(prices, params, initial_balance, fee)
+    st.subheader("포트폴리오 (공유 자본, 균등 비중)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("포트폴리오 수익률", f"{result.profit_pct:.2f}%")
+    col2.metric("최종 자산", f"{result.final_value:,.0f}")
+    col3.metric("최대 낙폭", f"{result.max_drawdown:.2f}%")
+    st.line_chart(result.equity_curve())
+    summary = result.summary().rename(columns={'trade_count': "거래 수", 'pnl': "실현 손익"})
+    summary.index = [names[ticker] for ticker in summary.index]
+    st.dataframe(summary)
+
+
+# 유니버스 다이버전스 스캔: 종목별 마지막 봉 기준 최근 lookback 봉 안에 나온 다이버전스
+def show_divergence_scan(prices, names, params, lookback=SCAN_LOOKBACK):
+    st.subheader(f"최근 {lookback}봉 다이버전스 스캔")
+    found = scan_universe(prices, params, lookback=lookback)
+    if found.empty:
+        st.info("최근 다이버전스가 나온 종목이 없습니다.")
+        return
+    found.insert(0, '종목', found['ticker'].map(names))
+    found['kind'] = found['kind'].map({'bullish': "강세", 'bearish': "약세"})
+    st.dataframe(found.rename(columns={'ticker': "티커", 'kind': "종류", 'date_p1': "이전 극값일", 'date_p2': "극값일",
+                                       'close_p1': "이전 종가", 'close_p2': "종가", 'rsi_p1': "이전 RSI",
+                                       'rsi_p2': "RSI", 'bars_ago': "경과 봉"}))
+    st.caption(f"마지막 {params['extrema_order']}봉 안의 극값은 이후 데이터에 따라 바뀔 수 있는 잠정 값입니다.")
 
 
 def average_profit_calculator(initial_balance, fee, stock_options):
-    st.header("한국 주식 전체 평균 수익률 계산")
-    st.info("아래의 고정 파라미터로 모든 한국 주식 종목의 **상장일 ~ 2023-05-31** 기간의 평균 수익률을 계산합니다.")
+    st.header("종목 유니버스 평균 수익률 계산")
+    st.info("아래의 고정 파라미터로 선택한 카테고리 전 종목의 **상장일 ~ 2023-05-31** 기간의 평균 수익률을 계산합니다.")
+    categories = st.multiselect("분석 대상 카테고리", list(stock_options.keys()), default=["한국 주식"])
+    if not categories:
+        st.warning("분석할 카테고리를 하나 이상 선택하세요.")
+        st.stop()
+    universe = universe_from_options(stock_options, categories)
     st.subheader("분석 대상 종목")
 
-    stock_list = [
-        "**삼성전자**", "**삼천당제약**", "**엔씨소프트**",
-        "**LG화학**", "**테라젠이텍스**", "**엘앤에프**",
-        "**셀트리온제약**", "**대주전자재료**", "**SK이노베이션**",
-        "**한미약품**", "**종근당**", "**더블유게임즈**",
-        "**삼성바이오로직스**", "**넷마블**", "**카카오게임즈**",
-        "**에너지솔루션**", "**에코프로비엠**", "<del>**넥슨게임즈**</del>",
-        "**LG에너지솔루션**"
-    ]
+    stock_list = [f"<del>**{split_stock_item(item)[1]}**</del>" if item in NO_DATA_ITEMS
+                  else f"**{split_stock_item(item)[1]}**" for item in universe]
     chunks = [stock_list[i:i + 3] for i in range(0, len(stock_list), 3)]
     for chunk in chunks:
         cols = st.columns(3)
         for i, stock in enumerate(chunk):
             cols[i].markdown(f"{stock}", unsafe_allow_html=True)
-    st.warning("**특이사항:** 넥슨게임즈는 yfinance에 데이터가 없어 목록에서 제외했습니다.")
+    missing = [split_stock_item(item)[1] for item in universe if item in NO_DATA_ITEMS]
+    if missing:
+        st.warning(f"**특이사항:** {', '.join(missing)}은(는) yfinance에 데이터가 없어 평균에서 제외됩니다.")
     st.markdown("---")
     st.subheader("분석 파라미터")
 
@@ -310,52 +490,55 @@ def average_profit_calculator(initial_balance, fee, stock_options):
         - **RSI 과매수:** **70**
         """)
 
-    fixed_params = {
-        'kr_window': 50, 'kr_bandwidth': 5.0, 'bb_k': 0.7,
-        'rsi_period': 14, 'extrema_order': 5,
-        'rsi_oversold': 30, 'rsi_overbought': 70,
-    }
+    fixed_params = dict(DEFAULT_PARAMS)
     start_date_korean = '1990-01-01'
     end_date_korean = '2023-05-31'
 
+    st.markdown("---")
+    st.subheader("실행 설정")
+    col1, col2 = st.columns(2)
+    with col1:
+        load_workers = st.number_input("동시 다운로드 수", min_value=1, max_value=32, value=8, step=1)
+    with col2:
+        backtest_workers = st.number_input("백테스트 워커 수 (프로세스)", min_value=1,
+                                           max_value=default_workers(), value=default_workers(), step=1)
+
     if st.button("평균 수익률 계산 시작"):
-        with st.spinner("모든 한국 주식의 백테스트를 실행하고 있습니다. 잠시만 기다려주세요..."):
-            all_profit_percentages = []
-            successful_stocks = []
-            korean_stocks = stock_options["한국 주식"]
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, stock_item in enumerate(korean_stocks):
-                try:
-                    ticker = stock_item.split(' ')[0]
-                    stock_name = stock_item.split(' ')[1].strip('()')
-                    df_korean = load_data(ticker, start=start_date_korean, end=end_date_korean)
-                    if df_korean.empty:
-                        status_text.warning(f"경고: {stock_name} ({ticker}) 데이터가 없어 건너뜁니다.")
-                        continue
-                    profit_pct, _, _, _, _ = run_backtest(df_korean, fixed_params, initial_balance, fee)
-                    all_profit_percentages.append(profit_pct)
-                    successful_stocks.append(stock_item)
-                    progress_percentage = (i + 1) / len(korean_stocks)
-                    progress_bar.progress(progress_percentage)
-                    status_text.info(f"{stock_name} ({ticker}) 백테스트 완료. 수익률: {profit_pct:.2f}%")
-                except Exception as e:
-                    status_text.error(f"오류 발생: {stock_name} ({ticker}) - {e}")
-                    continue
-            progress_bar.empty()
-            status_text.empty()
-        
+        all_profit_percentages = []
+        successful_stocks = []
+
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        table_placeholder = st.empty()
+
+        results = evaluate_universe(universe, fixed_params, start_date_korean, end_date_korean,
+                                    initial_balance, fee, store=get_store(),
+                                    load_workers=load_workers, backtest_workers=backtest_workers)
+        for done, result in enumerate(results, start=1):
+            progress_bar.progress(done / len(universe))
+            if result['error'] == NO_DATA:
+                status_text.warning(f"경고: {result['name']} ({result['ticker']}) 데이터가 없어 건너뜁니다.")
+            elif result['error']:
+                status_text.error(f"오류 발생: {result['name']} ({result['ticker']}) - {result['error']}")
+            else:
+                all_profit_percentages.append(result['profit_pct'])
+                successful_stocks.append(result['item'])
+                status_text.info(f"{result['name']} ({result['ticker']}) 백테스트 완료. 수익률: {result['profit_pct']:.2f}%")
+                table_placeholder.dataframe(_profit_table(successful_stocks, all_profit_percentages))
+        progress_bar.empty()
+        status_text.empty()
+        table_placeholder.empty()
+
         if all_profit_percentages:
             average_profit = np.mean(all_profit_percentages)
             st.subheader("최종 결과")
-            st.success(f"**전체 한국 주식 평균 수익률: {average_profit:.2f}%**")
+            st.success(f"**선택 종목 평균 수익률: {average_profit:.2f}%** ({len(all_profit_percentages)}개 종목)")
+            st.write("---")
+            st.dataframe(_profit_table(successful_stocks, all_profit_percentages))
             st.write("---")
-            st.dataframe(pd.DataFrame({
-                "종목": [item.split(' ')[1].strip('()') for item in successful_stocks],
-                "티커": [item.split(' ')[0] for item in successful_stocks],
-                "수익률 (%)": all_profit_percentages
-            }))
+            prices, names = _universe_panel(successful_stocks, start_date_korean, end_date_korean)
+            if prices is not None:
+                show_portfolio_result(prices, names, fixed_params, initial_balance, fee)
+                show_divergence_scan(prices, names, fixed_params)
         else:
-            st.warning("계산 가능한 주식 데이터가 없습니다. 다시 시도해주세요.")
\ No newline at end of file
+            st.warning("계산 가능한 주식 데이터가 없습니다. 다시 시도해주세요.")